@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+
+
+def run_offsets(codes, values):
+    # (start, stop) of every run of equal codes in already sorted rows
+    if len(codes[0]) == 0:
+        return {}
+    changes = np.zeros(len(codes[0]), dtype=bool)
+    changes[0] = True
+    for column in codes:
+        changes[1:] |= column[1:] != column[:-1]
+    starts = np.flatnonzero(changes)
+    stops = np.append(starts[1:], len(changes))
+
+    offsets = {}
+    for start, stop in zip(starts, stops):
+        if any(column[start] < 0 for column in codes):
+            continue
+        offsets[tuple(value[column[start]] for column, value in zip(codes, values))] = (
+            start,
+            stop,
+        )
+    return offsets
+
+
+class AlertStore:
+    # alerts sorted once by (rule, group) so every group is a contiguous
+    # slice; rows keep their original order and index labels within a group
+    def __init__(self, data, case_insensitive=False):
+        rule_ids = data["Rule ID"].astype(object)
+        rule_keys = rule_ids.str.upper() if case_insensitive else rule_ids
+        groups = data["Population Group"].astype(object)
+
+        key_codes, key_values = pd.factorize(rule_keys)
+        group_codes, group_values = pd.factorize(groups)
+        rule_codes, rule_values = pd.factorize(rule_ids)
+        order = np.lexsort((rule_codes, group_codes, key_codes))
+
+        self.case_insensitive = case_insensitive
+        self.data = data.take(order)
+        self.rule_keys = rule_keys.take(order)
+
+        key_codes = key_codes[order]
+        group_codes = group_codes[order]
+        rule_codes = rule_codes[order]
+        self.group_offsets = run_offsets(
+            [key_codes, group_codes], [key_values, group_values]
+        )
+        self.rule_offsets = run_offsets(
+            [key_codes, group_codes, rule_codes],
+            [key_values, group_values, rule_values],
+        )
+        # the exact-casing runs are looked up without the normalized key
+        self.rule_offsets = {
+            (rule, group): offsets
+            for (_, group, rule), offsets in self.rule_offsets.items()
+        }
+
+    def __len__(self):
+        return len(self.data)
+
+    def slice(self, offsets):
+        start, stop = offsets if offsets is not None else (0, 0)
+        return self.data.iloc[start:stop]
+
+    def alerts(self, rule, group):
+        # alerts of exactly this Rule ID in the population group
+        return self.slice(self.rule_offsets.get((rule, group)))
+
+    def group_alerts(self, rule_key, group):
+        # alerts of the normalized Rule ID, i.e. every casing when the store
+        # is case-insensitive
+        return self.slice(self.group_offsets.get((rule_key, group)))
@@ -0,0 +1,354 @@
+import numpy as np
+import pandas as pd
+
+from merged_tuning_tracker import GROUP_KEYS, alert_frame, threshold_mask
+from rule_registry import load_rule_registry
+from threshold_sweep import percentage
+
+DATE_COLUMN = "Alert Date"
+TRACKER_KEYS = [
+    "Rule ID",
+    "Population Group",
+    "Parameter Type",
+    "Operator",
+    "Recommended Threshold",
+]
+BTL_DECISIONS = ["Interesting", "Not Interesting"]
+ATL_DECISIONS = ["SAR Filed", "Interesting", "Not Interesting"]
+
+
+def month_positions(dates):
+    # every month from the first alert to the last, including empty ones;
+    # alerts without a date are in no month (-1)
+    periods = pd.to_datetime(pd.Series(dates), errors="coerce").dt.to_period("M")
+    if periods.isna().all():
+        raise ValueError(f"No {DATE_COLUMN} values to split the alerts by month")
+    months = pd.period_range(periods.min(), periods.max(), freq="M")
+    return months, months.get_indexer(periods)
+
+
+def prefix_sums(counts):
+    # counts is (rows, months, cells); row r's counts over months [i, j) are
+    # sums[r, j] - sums[r, i]
+    sums = np.zeros(
+        (counts.shape[0], counts.shape[1] + 1, counts.shape[2]), dtype=np.int64
+    )
+    np.cumsum(counts, axis=1, out=sums[:, 1:])
+    return sums
+
+
+def date_range(first_month, last_month):
+    # formatted like calculate_date_range
+    return (
+        f"{first_month.start_time.strftime('%m/%d/%Y')} - "
+        f"{last_month.end_time.strftime('%m/%d/%Y')}"
+    )
+
+
+def btl_metrics(counts, prop_counts, net_counts):
+    interesting, not_interesting = counts[..., 0], counts[..., 1]
+    prop_interesting, prop_notinteresting = prop_counts[..., 0], prop_counts[..., 1]
+    net_interesting, net_notinteresting = net_counts[..., 0], net_counts[..., 1]
+    return {
+        "Interesting Alerts": interesting,
+        "Not Interesting Alerts": not_interesting,
+        "Prop Interesting Alerts": prop_interesting,
+        "Prop Not Interesting Alerts": prop_notinteresting,
+        "Effectiveness": percentage(interesting, interesting + not_interesting),
+        "Prop Effectiveness": percentage(
+            prop_interesting, prop_interesting + prop_notinteresting
+        ),
+        "Net Effectiveness": percentage(
+            net_interesting, net_interesting + net_notinteresting
+        ),
+    }
+
+
+def atl_metrics(counts, prop_counts, net_counts):
+    sar, interesting, not_interesting = counts[..., 0], counts[..., 1], counts[..., 2]
+    prop_sar, prop_interesting, prop_notinteresting = (
+        prop_counts[..., 0],
+        prop_counts[..., 1],
+        prop_counts[..., 2],
+    )
+    net_sar, net_interesting, net_notinteresting = (
+        net_counts[..., 0],
+        net_counts[..., 1],
+        net_counts[..., 2],
+    )
+    alerts = counts.sum(axis=-1)
+    return {
+        "Num Alerts Extracted": alerts,
+        "SARs Filed": sar,
+        "Interesting Alerts": interesting,
+        "Not Interesting Alerts": not_interesting,
+        "Prop SARs Filed": prop_sar,
+        "Prop Interesting Alerts": prop_interesting,
+        "Prop Not Interesting Alerts": prop_notinteresting,
+        "Effectiveness": percentage(interesting + sar, alerts),
+        "Prop Effectiveness": percentage(
+            prop_interesting + prop_sar,
+            prop_sar + prop_interesting + prop_notinteresting,
+        ),
+        "Net Effectiveness": percentage(
+            net_interesting + net_sar, net_sar + net_interesting + net_notinteresting
+        ),
+    }
+
+
+class MonthlyAggregates:
+    # decision counts per tracker group and month, and threshold-pass counts
+    # per tracker row and month, held as prefix sums over the months so the
+    # counts of any run of consecutive months are one subtraction per group.
+    # the last count of every month is the alerts with none of the decisions
+    def __init__(
+        self,
+        tracker,
+        groups,
+        row_groups,
+        months,
+        decisions,
+        counts,
+        prop_counts,
+        net_counts,
+        metrics,
+    ):
+        self.tracker = tracker
+        self.groups = groups
+        self.row_groups = row_groups
+        self.months = months
+        self.decisions = decisions
+        self.counts = prefix_sums(counts)
+        self.prop_counts = prefix_sums(prop_counts)
+        self.net_counts = prefix_sums(net_counts)
+        self.metrics = metrics
+
+    def month_position(self, month):
+        position = self.months.get_indexer([pd.Period(month, freq="M")])[0]
+        if position < 0:
+            raise ValueError(
+                f"{month} is outside {self.months[0]} to {self.months[-1]}"
+            )
+        return position
+
+    def window_positions(self, first_month=None, last_month=None):
+        # first_month to last_month, both included; the whole period by default
+        start = 0 if first_month is None else self.month_position(first_month)
+        stop = (
+            len(self.months)
+            if last_month is None
+            else self.month_position(last_month) + 1
+        )
+        if stop <= start:
+            raise ValueError(f"{last_month} is before {first_month}")
+        return np.array([start]), np.array([stop])
+
+    def row_counts(self, starts, stops):
+        # the decision, threshold-pass and net counts of every tracker row for
+        # each window [starts[w], stops[w]), as (tracker rows, windows, cells)
+        counts = self.counts[:, stops] - self.counts[:, starts]
+        prop_counts = self.prop_counts[:, stops] - self.prop_counts[:, starts]
+        net_counts = self.net_counts[:, stops] - self.net_counts[:, starts]
+        return counts[self.row_groups], prop_counts, net_counts[self.row_groups]
+
+    def window_frame(self, starts, stops):
+        metrics = self.metrics(*self.row_counts(starts, stops))
+        n_rows, n_windows = len(self.tracker), len(starts)
+        frame = self.tracker.iloc[np.repeat(np.arange(n_rows), n_windows)]
+        frame = frame.reset_index(drop=True)
+        frame["Window Start"] = np.tile(self.months[starts].astype(str), n_rows)
+        frame["Window End"] = np.tile(self.months[stops - 1].astype(str), n_rows)
+        frame["Date Range"] = np.tile(
+            [
+                date_range(self.months[start], self.months[stop - 1])
+                for start, stop in zip(starts, stops)
+            ],
+            n_rows,
+        )
+        for column, values in metrics.items():
+            frame[column] = values.reshape(-1)
+        return frame
+
+    def window(self, first_month=None, last_month=None):
+        return self.window_frame(*self.window_positions(first_month, last_month))
+
+    def rolling(self, window_months=12, step=1):
+        # every window of window_months consecutive months, each tracker row's
+        # windows in month order
+        if window_months < 1 or window_months > len(self.months):
+            raise ValueError(
+                f"Window of {window_months} months does not fit in "
+                f"{len(self.months)} months of alerts"
+            )
+        starts = np.arange(0, len(self.months) - window_months + 1, step)
+        return self.window_frame(starts, starts + window_months)
+
+    def monthly_counts(self):
+        # the decision counts of every group and month
+        counts = np.diff(self.counts, axis=1)
+        n_groups, n_months = counts.shape[0], counts.shape[1]
+        frame = pd.DataFrame(
+            {
+                "Rule ID": np.repeat(self.groups.get_level_values(0), n_months),
+                "Population Group": np.repeat(
+                    self.groups.get_level_values(1), n_months
+                ),
+                "Month": np.tile(self.months.astype(str), n_groups),
+                "Alerts": counts.sum(axis=-1).reshape(-1),
+            }
+        )
+        for position, decision in enumerate(self.decisions):
+            frame[decision] = counts[..., position].reshape(-1)
+        return frame
+
+
+def monthly_aggregates(
+    tracker,
+    alert_data,
+    decisions,
+    tracker_rules,
+    alert_rules,
+    prop_parameters,
+    net_parameters,
+    metrics,
+):
+    # one pass over each group's alerts: the month and decision of every
+    # alert are folded into one cell code and counted per group, per tracker
+    # row that the alert passes, and for the group's net thresholds
+    tracker = tracker.reset_index(drop=True)
+    tracker_rules = pd.Series(tracker_rules).reset_index(drop=True)
+    months, alert_months = month_positions(alert_data[DATE_COLUMN])
+    n_cells = len(months) * (len(decisions) + 1)
+
+    groups = pd.MultiIndex.from_arrays(
+        [
+            tracker_rules.astype(object).to_numpy(),
+            tracker["Population Group"].astype(object).to_numpy(),
+        ],
+        names=GROUP_KEYS,
+    )
+    row_groups = groups.unique().get_indexer(groups)
+    groups = groups.unique()
+    alert_groups = groups.get_indexer(
+        pd.MultiIndex.from_arrays(
+            [
+                pd.Series(alert_rules).astype(object).to_numpy(),
+                alert_data["Population Group"].astype(object).to_numpy(),
+            ]
+        )
+    )
+
+    decision_codes = pd.Categorical(
+        alert_data["Tuning Decision"], categories=decisions
+    ).codes.astype(np.int64)
+    decision_codes[decision_codes < 0] = len(decisions)
+    cells = alert_months * (len(decisions) + 1) + decision_codes
+
+    # alerts sorted by group once, so each group is a contiguous run
+    in_group = np.flatnonzero((alert_groups >= 0) & (alert_months >= 0))
+    order = in_group[np.argsort(alert_groups[in_group], kind="stable")]
+    bounds = np.searchsorted(alert_groups[order], np.arange(len(groups) + 1))
+
+    prop_parameters = np.asarray(prop_parameters, dtype=object)
+    net_parameters = pd.Series(np.asarray(net_parameters, dtype=object))
+    values = {
+        param: pd.to_numeric(alert_data[param], errors="coerce").to_numpy(dtype=float)
+        for param in pd.unique(np.append(prop_parameters, net_parameters))
+    }
+    thresholds = tracker["Recommended Threshold"].astype(float).to_numpy()
+    # net effectiveness only looks up alerts of an exact tracker Rule ID, and
+    # when a rule is in the tracker in several casings the one that appears
+    # last sets every group's result
+    exact_rules = alert_data["Rule ID"].astype(object).to_numpy()
+    first_rows = ~tracker["Rule ID"].duplicated().to_numpy()
+    net_rules = dict(zip(tracker_rules[first_rows], tracker["Rule ID"][first_rows]))
+
+    counts = np.zeros((len(groups), n_cells), dtype=np.int64)
+    prop_counts = np.zeros((len(tracker), n_cells), dtype=np.int64)
+    net_counts = np.zeros((len(groups), n_cells), dtype=np.int64)
+    for group in range(len(groups)):
+        rows = order[bounds[group] : bounds[group + 1]]
+        group_cells = cells[rows]
+        counts[group] = np.bincount(group_cells, minlength=n_cells)
+
+        tracker_rows = np.flatnonzero(row_groups == group)
+        for row in tracker_rows:
+            passed = values[prop_parameters[row]][rows] >= thresholds[row]
+            prop_counts[row] = np.bincount(group_cells[passed], minlength=n_cells)
+
+        parameters = net_parameters[tracker_rows]
+        mask = threshold_mask(
+            {param: values[param][rows] for param in parameters.unique()},
+            tracker.iloc[tracker_rows],
+            parameters,
+        )
+        mask &= exact_rules[rows] == net_rules[groups[group][0]]
+        net_counts[group] = np.bincount(group_cells[mask], minlength=n_cells)
+
+    shape = (len(months), len(decisions) + 1)
+    return MonthlyAggregates(
+        tracker[[column for column in TRACKER_KEYS if column in tracker.columns]],
+        groups,
+        row_groups,
+        months,
+        decisions,
+        counts.reshape((len(groups),) + shape),
+        prop_counts.reshape((len(tracker),) + shape)[..., : len(decisions)],
+        net_counts.reshape((len(groups),) + shape)[..., : len(decisions)],
+        metrics,
+    )
+
+
+def monthly_aggregates_btl(tracker, sample_data, registry=None):
+    # thresholds as the BTL tracker applies them: the proposed counts on each
+    # row's own Parameter Type, net effectiveness on the registry's parameter
+    if registry is None:
+        registry = load_rule_registry()
+    sample_data = alert_frame(sample_data)
+    return monthly_aggregates(
+        tracker,
+        sample_data,
+        BTL_DECISIONS,
+        tracker["Rule ID"],
+        sample_data["Rule ID"],
+        tracker["Parameter Type"],
+        registry.threshold_parameters(tracker, tracker["Rule ID"]),
+        btl_metrics,
+    )
+
+
+def monthly_aggregates_atl(tracker, dedupe_data, registry=None):
+    # Rule IDs are matched case-insensitively, as the ATL tracker does
+    if registry is None:
+        registry = load_rule_registry()
+    dedupe_data = alert_frame(dedupe_data)
+    tracker_rules = tracker["Rule ID"].str.upper()
+    parameters = registry.threshold_parameters(tracker, tracker_rules)
+    return monthly_aggregates(
+        tracker,
+        dedupe_data,
+        ATL_DECISIONS,
+        tracker_rules,
+        dedupe_data["Rule ID"].astype(object).str.upper(),
+        parameters,
+        parameters,
+        atl_metrics,
+    )
+
+
+if __name__ == "__main__":
+    from merged_tuning_tracker import filter_tracker, read_table, type_alerts
+
+    fp = "C:/Users/kadam/Documents/TM_Tuning_Codebase_Consolidation/Initial Data/"
+    ufp = "C:/Users/kadam/Documents/TM_Tuning_Codebase_Consolidation/New Data/"
+
+    tracker = filter_tracker(
+        read_table(fp + "Proposed ATL High Priority Thresholds.xlsx"), "Yes"
+    )
+    dedupe_data = type_alerts(
+        read_table(fp + "Actimize Alert Output - Parsed and Deduped.xlsx"),
+        "Dedupe data",
+    )
+    aggregates = monthly_aggregates_atl(tracker, dedupe_data)
+    aggregates.rolling(12).to_excel(ufp + "ATL Rolling Backtest.xlsx", index=False)
+    aggregates.monthly_counts().to_excel(ufp + "ATL Monthly Counts.xlsx", index=False)
@@ -0,0 +1,461 @@
+import os
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from alert_store import AlertStore
+from dedupe import dedupe_alerts
+from ingest import apply_alert_schema
+from merged_tuning_tracker import (
+    COLUMNS_TO_ADD_ATL,
+    COLUMNS_TO_ADD_BTL,
+    calculate_final_fields_atl,
+    calculate_final_fields_btl,
+    calculate_net_effectiveness_atl,
+    calculate_net_effectiveness_btl,
+    create_empty_columns,
+    filter_tracker,
+    populate_current_result_info_atl,
+    populate_current_result_info_btl,
+    write_tracker,
+)
+from sampling import PARAMS, sample_alerts
+
+RULE_FAMILIES = ["EBB", "EBO", "EBA", "FTF", "STR", "HBC"]
+RULE_PRODUCTS = ["IFT", "CCE", "AWR", "CSH", "WIR"]
+RULE_DIRECTIONS = ["ALL", "INN", "OUT", "CSH"]
+RULE_PERIODS = ["D01", "D05", "D07", "D30", "S01", "M01", "M03"]
+POPULATION_GROUPS = [
+    "Personal High",
+    "Personal Non-High",
+    "Business High",
+    "Business Non-High",
+]
+ATL_DECISIONS = ["SAR Filed", "Interesting", "Not Interesting", "Data Quality"]
+ATL_DECISION_WEIGHTS = [0.03, 0.12, 0.8, 0.05]
+BTL_DECISIONS = ["Interesting", "Not Interesting"]
+BTL_DECISION_WEIGHTS = [0.1, 0.9]
+OPERATORS = [">=", ">", "<=", "<"]
+OPERATOR_WEIGHTS = [0.85, 0.05, 0.05, 0.05]
+
+# (alerts, tracker rows) pairs from a small month to a full year of a large bank
+BENCHMARK_SIZES = [
+    (10_000, 10),
+    (100_000, 100),
+    (1_000_000, 500),
+    (10_000_000, 2_000),
+]
+TRACKER_ROWS_PER_GROUP = 1 + len(PARAMS)
+# share of extract rows that are re-extracts of another alert row, and share
+# of those re-extracts that also carry the same Data Date, so only their
+# position in the extract decides which row dedupe keeps
+DUPLICATE_RATE = 0.1
+TIE_RATE = 0.5
+BTL_SAMPLE_RATE = 0.1
+BTL_SAMPLE_MAX = 50_000
+
+
+def synthetic_rule_ids(n_rules, rng):
+    rule_ids = set()
+    while len(rule_ids) < n_rules:
+        rule_ids.add(
+            "-".join(
+                [
+                    "AML",
+                    rng.choice(RULE_FAMILIES),
+                    rng.choice(RULE_PRODUCTS),
+                    rng.choice(RULE_DIRECTIONS),
+                    rng.choice(["A", "P"]),
+                    rng.choice(RULE_PERIODS),
+                    "".join(rng.choice(list("ABCDEFGHIJKLMNOPQRSTUVWXYZ"), 3)),
+                ]
+            )
+        )
+    return sorted(rule_ids)
+
+
+def synthetic_groups(n_tracker_rows, rng):
+    # every (rule, group) gets a non-tunable row plus one row per parameter
+    n_groups = max(1, int(np.ceil(n_tracker_rows / TRACKER_ROWS_PER_GROUP)))
+    n_rules = max(1, int(np.ceil(n_groups / len(POPULATION_GROUPS))))
+    rule_ids = synthetic_rule_ids(n_rules, rng)
+    groups = [(rule, group) for rule in rule_ids for group in POPULATION_GROUPS]
+    return groups[:n_groups]
+
+
+def parameter_values(param, n, rng):
+    if param == "Occurrence_Parameter" or param == "Volume_Parameter":
+        return rng.poisson(3, n).astype(float) + 1
+    elif param == "Value_Parameter":
+        return np.round(rng.lognormal(8.5, 1.2, n), 2)
+    elif param == "Ratio_Parameter":
+        return np.round(rng.gamma(2.0, 1.5, n), 2)
+    else:
+        return np.round(rng.normal(3.5, 1.5, n).clip(0), 2)
+
+
+def synthetic_tracker(groups, n_tracker_rows, rng):
+    rows = []
+    for rule, group in groups:
+        rows.append(
+            {
+                "Rule ID": rule,
+                "Population Group": group,
+                "Parameter": "Maximum Score",
+                "Is Tunable": "No",
+                "Parameter Type": np.nan,
+                "Operator": ">=",
+                "Recommended Threshold": np.nan,
+            }
+        )
+        for param in PARAMS:
+            # thresholds sit around the middle of the parameter's distribution
+            threshold = np.quantile(parameter_values(param, 1_000, rng), 0.4)
+            rows.append(
+                {
+                    "Rule ID": rule,
+                    "Population Group": group,
+                    "Parameter": param.replace("_Parameter", ""),
+                    "Is Tunable": "Yes",
+                    "Parameter Type": param,
+                    "Operator": rng.choice(OPERATORS, p=OPERATOR_WEIGHTS),
+                    "Recommended Threshold": str(threshold),
+                }
+            )
+
+    tracker = pd.DataFrame(rows[:n_tracker_rows])
+    tracker.insert(0, "Rule Name", "Synthetic " + tracker["Rule ID"])
+    tracker["ATL/BTL"] = "ATL"
+    tracker["High/Low Priority"] = "High"
+    tracker["Current Threshold"] = tracker["Recommended Threshold"]
+    tracker["BTL Threshold"] = np.nan
+    tracker["Rationale"] = np.nan
+    tracker["AML Comments"] = np.nan
+    return tracker
+
+
+def synthetic_alerts(
+    groups,
+    n_alerts,
+    rng,
+    decisions=None,
+    decision_weights=None,
+    duplicate_rate=0.0,
+    tie_rate=0.0,
+):
+    # duplicates copy another row's dedupe keys and parameters but get their
+    # own UNIQUE_ID, score and decision, so the row dedupe keeps is visible.
+    # tied duplicates keep the original's dates, the rest are re-extracted
+    # up to 30 days later. no decisions gives an undecisioned population
+    n_duplicates = int(round(n_alerts * duplicate_rate))
+    n_unique = n_alerts - n_duplicates
+    group_index = rng.integers(0, len(groups), n_unique)
+    group_frame = pd.DataFrame(groups, columns=["Rule ID", "Population Group"])
+    alert_numbers = np.arange(n_unique) // 3
+    data_dates = pd.Timestamp("2023-01-31") + pd.to_timedelta(
+        rng.integers(0, 365, n_unique), unit="D"
+    )
+
+    alerts = pd.DataFrame(
+        {
+            "Alert ID": "SAM1-" + pd.Series(alert_numbers).astype(str),
+            "Rule ID": group_frame["Rule ID"].to_numpy()[group_index],
+            "Population Group": group_frame["Population Group"].to_numpy()[group_index],
+            "Alert Date": data_dates + pd.to_timedelta(10, unit="D"),
+            "Account Number": rng.integers(10**9, 10**9 + n_unique // 4 + 1, n_unique),
+            "Transaction Date": data_dates,
+            "Data Date": data_dates,
+        }
+    )
+    for param in PARAMS:
+        alerts[param] = parameter_values(param, n_unique, rng)
+
+    if n_duplicates:
+        duplicates = alerts.take(rng.integers(0, n_unique, n_duplicates))
+        shift = rng.integers(1, 31, n_duplicates)
+        shift[rng.random(n_duplicates) < tie_rate] = 0
+        duplicates["Data Date"] = duplicates["Data Date"] + pd.to_timedelta(
+            shift, unit="D"
+        )
+        alerts = pd.concat([alerts, duplicates]).take(rng.permutation(n_alerts))
+        alerts = alerts.reset_index(drop=True)
+
+    alerts.insert(1, "UNIQUE_ID", "SAM1-" + pd.Series(np.arange(n_alerts)).astype(str))
+    alerts.insert(5, "Alert Score", rng.integers(50, 100, n_alerts))
+    if decisions is not None:
+        alerts.insert(
+            1, "Tuning Decision", rng.choice(decisions, n_alerts, p=decision_weights)
+        )
+    return alerts
+
+
+def synthetic_sample(delta_alerts, rng):
+    # the BTL sample is a share of the delta population that analysts have
+    # decisioned, not the population itself
+    n_sample = min(
+        len(delta_alerts),
+        BTL_SAMPLE_MAX,
+        max(1, int(len(delta_alerts) * BTL_SAMPLE_RATE)),
+    )
+    positions = np.sort(rng.choice(len(delta_alerts), n_sample, replace=False))
+    sample = delta_alerts.take(positions).reset_index(drop=True)
+    sample.insert(
+        1,
+        "Tuning Decision",
+        rng.choice(BTL_DECISIONS, n_sample, p=BTL_DECISION_WEIGHTS),
+    )
+    return sample
+
+
+def synthetic_dataset(
+    n_alerts, n_tracker_rows, seed=0, duplicate_rate=DUPLICATE_RATE, tie_rate=TIE_RATE
+):
+    # the ATL extract is raw, with duplicates for dedupe_alerts to remove; the
+    # BTL delta is already deduped, as it is in the real workflow
+    rng = np.random.default_rng(seed)
+    groups = synthetic_groups(n_tracker_rows, rng)
+    tracker = synthetic_tracker(groups, n_tracker_rows, rng)
+    atl_alerts = synthetic_alerts(
+        groups,
+        n_alerts,
+        rng,
+        ATL_DECISIONS,
+        ATL_DECISION_WEIGHTS,
+        duplicate_rate,
+        tie_rate,
+    )
+    btl_delta = synthetic_alerts(groups, n_alerts, rng)
+    btl_sample = synthetic_sample(btl_delta, rng)
+    return tracker, atl_alerts, btl_delta, btl_sample
+
+
+def write_alerts(file_path, sheets):
+    if file_path.endswith(".parquet"):
+        # Parquet holds a single table, the last sheet is the one the pipeline reads
+        list(sheets.values())[-1].to_parquet(file_path, index=False)
+        return
+    with pd.ExcelWriter(file_path) as writer:
+        for sheet_name, alerts in sheets.items():
+            alerts.to_excel(writer, sheet_name=sheet_name, index=False)
+
+
+def write_dataset(
+    directory,
+    n_alerts,
+    n_tracker_rows,
+    seed=0,
+    duplicate_rate=DUPLICATE_RATE,
+    tie_rate=TIE_RATE,
+):
+    # same workbook layout as the real inputs; extracts past the Excel row
+    # limit are written as Parquet, which the chunked readers pick up by extension
+    tracker, atl_alerts, btl_delta, btl_sample = synthetic_dataset(
+        n_alerts, n_tracker_rows, seed, duplicate_rate, tie_rate
+    )
+    atl_alerts = dedupe_alerts(atl_alerts)
+    os.makedirs(directory, exist_ok=True)
+    extension = ".xlsx" if n_alerts < 1_000_000 else ".parquet"
+
+    tracker.to_excel(
+        os.path.join(directory, "Synthetic Tracker.xlsx"),
+        sheet_name="Threshold Decisions",
+        index=False,
+    )
+    write_alerts(
+        os.path.join(directory, f"Synthetic ATL Alerts{extension}"),
+        {"Parsed and Deduped": atl_alerts},
+    )
+    write_alerts(
+        os.path.join(directory, f"Synthetic BTL Delta{extension}"),
+        {
+            "Population Data DeDuped": btl_delta,
+            "Delta Population": btl_delta,
+        },
+    )
+    write_alerts(
+        os.path.join(directory, "Synthetic BTL Sample.xlsx"),
+        {"To Decision": btl_sample},
+    )
+
+
+def measure(results, label, stage, function, *args, memory=True):
+    if memory:
+        tracemalloc.start()
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+    try:
+        result = function(*args)
+    finally:
+        wall = time.perf_counter() - wall_start
+        cpu = time.process_time() - cpu_start
+        peak = tracemalloc.get_traced_memory()[1] if memory else np.nan
+        if memory:
+            tracemalloc.stop()
+
+    rows = result[0] if isinstance(result, tuple) else result
+    results.append(
+        {
+            "Size": label,
+            "Stage": stage,
+            "Rows": len(rows) if isinstance(rows, pd.DataFrame) else np.nan,
+            "Wall (s)": round(wall, 4),
+            "CPU (s)": round(cpu, 4),
+            "Peak Memory (MB)": round(peak / 1e6, 2),
+        }
+    )
+    return result
+
+
+def benchmark_atl(results, label, tracker, alerts, output_dir, memory=True):
+    alerts = measure(results, label, "ATL type alerts", apply_alert_schema, alerts)
+    alerts = measure(results, label, "ATL index alerts", AlertStore, alerts, True)
+    tracker = measure(
+        results, label, "ATL filter_tracker", filter_tracker, tracker, "Yes"
+    )
+    tracker = create_empty_columns(tracker, COLUMNS_TO_ADD_ATL)
+    tracker = measure(
+        results,
+        label,
+        "ATL populate_current_result_info_atl",
+        populate_current_result_info_atl,
+        tracker,
+        alerts,
+        memory=memory,
+    )
+    tracker, _ = measure(
+        results,
+        label,
+        "ATL calculate_net_effectiveness_atl",
+        calculate_net_effectiveness_atl,
+        tracker,
+        alerts,
+        memory=memory,
+    )
+    tracker = measure(
+        results,
+        label,
+        "ATL calculate_final_fields_atl",
+        calculate_final_fields_atl,
+        tracker,
+    )
+    measure(
+        results,
+        label,
+        "ATL write_tracker",
+        write_tracker,
+        tracker.fillna(0),
+        os.path.join(output_dir, "Synthetic ATL Tracker.xlsx"),
+    )
+
+
+def benchmark_btl(results, label, tracker, delta, sample, output_dir, memory=True):
+    delta = measure(results, label, "BTL type delta", apply_alert_schema, delta)
+    sample = measure(results, label, "BTL type sample", apply_alert_schema, sample)
+    sample = measure(results, label, "BTL index sample", AlertStore, sample)
+    tracker = measure(
+        results, label, "BTL filter_tracker", filter_tracker, tracker, "Yes"
+    )
+    tracker = create_empty_columns(tracker, COLUMNS_TO_ADD_BTL)
+    tracker = measure(
+        results,
+        label,
+        "BTL populate_current_result_info_btl",
+        populate_current_result_info_btl,
+        tracker,
+        delta,
+        sample,
+        memory=memory,
+    )
+    tracker = measure(
+        results,
+        label,
+        "BTL calculate_net_effectiveness_btl",
+        calculate_net_effectiveness_btl,
+        tracker,
+        sample,
+        memory=memory,
+    )
+    tracker = measure(
+        results,
+        label,
+        "BTL calculate_final_fields_btl",
+        calculate_final_fields_btl,
+        tracker,
+    )
+    measure(
+        results,
+        label,
+        "BTL write_tracker",
+        write_tracker,
+        tracker.fillna(0),
+        os.path.join(output_dir, "Synthetic BTL Tracker.xlsx"),
+    )
+
+
+def run_benchmarks(
+    sizes,
+    output_dir,
+    seed=0,
+    memory=True,
+    duplicate_rate=DUPLICATE_RATE,
+    tie_rate=TIE_RATE,
+):
+    # tracemalloc slows the row-by-row stages down, so memory=False gives
+    # cleaner timings on the largest sizes
+    os.makedirs(output_dir, exist_ok=True)
+    results = []
+
+    for n_alerts, n_tracker_rows in sizes:
+        label = f"{n_alerts} alerts / {n_tracker_rows} tracker rows"
+        print(f"Benchmarking {label}")
+        tracker, atl_alerts, btl_delta, btl_sample = measure(
+            results,
+            label,
+            "Generate data",
+            synthetic_dataset,
+            n_alerts,
+            n_tracker_rows,
+            seed,
+            duplicate_rate,
+            tie_rate,
+            memory=False,
+        )
+
+        deduped = measure(
+            results, label, "dedupe_alerts", dedupe_alerts, atl_alerts, memory=memory
+        )
+        measure(
+            results,
+            label,
+            "sample_alerts",
+            sample_alerts,
+            deduped,
+            True,
+            memory=memory,
+        )
+
+        benchmark_atl(results, label, tracker, deduped, output_dir, memory)
+        benchmark_btl(
+            results, label, tracker, btl_delta, btl_sample, output_dir, memory
+        )
+
+    return pd.DataFrame(results)
+
+
+if __name__ == "__main__":
+    output_dir = "C:/Users/kadam/Documents/TM_Tuning_Codebase_Consolidation/Benchmarks/"  # update file path
+
+    results = run_benchmarks(BENCHMARK_SIZES[:2], output_dir)
+    results.insert(0, "Run Date", pd.Timestamp.now().strftime("%Y-%m-%d %H:%M"))
+
+    # append so successive runs can be compared for regressions
+    results_file = output_dir + "Benchmark Results.csv"
+    results.to_csv(
+        results_file,
+        mode="a",
+        header=not os.path.exists(results_file),
+        index=False,
+    )
+    print(results.to_string(index=False))
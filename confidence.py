@@ -0,0 +1,202 @@
+from statistics import NormalDist
+
+import numpy as np
+
+from backtest import monthly_aggregates_atl, monthly_aggregates_btl
+from sampling import CONFIDENCE_LEVEL
+from threshold_sweep import percentage
+
+BOOTSTRAP_REPLICATES = 2000
+# fixed so a rerun on the same alerts reports the same intervals
+BOOTSTRAP_SEED = 20230601
+# resampled counts held at once, as tracker rows x replicates
+BATCH_DRAWS = 2_000_000
+
+# (metric, counts it is taken from, numerator cells, denominator cells). the
+# cells are the tracker's decisions in order followed by every other alert of
+# the group: for "counts" the alerts with another decision, for "prop" and
+# "net" the alerts that fail the threshold
+BTL_INTERVAL_METRICS = [
+    ("Effectiveness", "counts", [0], [0, 1]),
+    ("Prop Effectiveness", "prop", [0], [0, 1]),
+    ("Net Effectiveness", "net", [0], [0, 1]),
+]
+ATL_INTERVAL_METRICS = [
+    ("Effectiveness", "counts", [0, 1], [0, 1, 2, 3]),
+    ("SAR Yield", "counts", [0], [0, 1, 2, 3]),
+    ("Prop Effectiveness", "prop", [0, 1], [0, 1, 2]),
+    ("Prop SAR Yield", "prop", [0], [0, 1, 2]),
+    ("Net Effectiveness", "net", [0, 1], [0, 1, 2]),
+    ("Net SAR Yield", "net", [0], [0, 1, 2]),
+]
+
+
+def with_rest(counts, totals):
+    # appends the alerts outside the counted cells, so every row sums to its
+    # group's alerts
+    return np.concatenate([counts, (totals - counts.sum(axis=1))[:, None]], axis=1)
+
+
+def multinomial_replicates(cells, replicates, rng):
+    # every row's cells redrawn replicates times from their own proportions,
+    # as one binomial per cell on what the earlier cells left; the draws for
+    # all rows of a batch are made together
+    n_rows, n_cells = cells.shape
+    draws = np.empty((n_rows, replicates, n_cells), dtype=np.int64)
+    remaining = np.repeat(cells.sum(axis=1)[:, None], replicates, axis=1)
+    left = cells.sum(axis=1).astype(float)
+    for cell in range(n_cells - 1):
+        probability = np.divide(
+            cells[:, cell], left, out=np.zeros(n_rows), where=left > 0
+        )
+        draws[:, :, cell] = rng.binomial(remaining, np.clip(probability, 0, 1)[:, None])
+        remaining -= draws[:, :, cell]
+        left -= cells[:, cell]
+    draws[:, :, -1] = remaining
+    return draws
+
+
+def row_quantiles(values, quantiles):
+    # linear quantiles of each row ignoring NaN, without a per-row loop
+    ordered = np.sort(values, axis=1)
+    valid = (~np.isnan(ordered)).sum(axis=1)
+    results = []
+    for quantile in quantiles:
+        position = quantile * np.maximum(valid - 1, 0)
+        below = np.floor(position).astype(np.int64)
+        above = np.minimum(below + 1, np.maximum(valid - 1, 0))
+        low = np.take_along_axis(ordered, below[:, None], axis=1)[:, 0]
+        high = np.take_along_axis(ordered, above[:, None], axis=1)[:, 0]
+        result = low + (high - low) * (position - below)
+        results.append(np.where(valid > 0, result, np.nan))
+    return results
+
+
+def ratio(draws, numerator, denominator):
+    totals = draws[..., denominator].sum(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(
+            totals > 0, 100 * draws[..., numerator].sum(axis=-1) / totals, np.nan
+        )
+
+
+def bootstrap_intervals(cells, metrics, replicates, level, rng):
+    # percentile intervals of each metric taken from the same cells. tracker
+    # rows of one group share its counts, so each distinct row of cells is
+    # resampled once, in batches that keep the draws within BATCH_DRAWS
+    tails = [(1 - level) / 2, (1 + level) / 2]
+    distinct, rows = np.unique(cells, axis=0, return_inverse=True)
+    intervals = {
+        name: (np.empty(len(distinct)), np.empty(len(distinct))) for name, *_ in metrics
+    }
+    batch_rows = max(1, BATCH_DRAWS // replicates)
+    for start in range(0, len(distinct), batch_rows):
+        batch = slice(start, start + batch_rows)
+        draws = multinomial_replicates(distinct[batch], replicates, rng)
+        for name, numerator, denominator in metrics:
+            lower, upper = row_quantiles(ratio(draws, numerator, denominator), tails)
+            intervals[name][0][batch] = lower
+            intervals[name][1][batch] = upper
+    rows = rows.reshape(-1)
+    return {
+        name: (lower[rows], upper[rows]) for name, (lower, upper) in intervals.items()
+    }
+
+
+def wilson_interval(successes, trials, level):
+    z = NormalDist().inv_cdf((1 + level) / 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        proportion = successes / trials
+        scale = 1 + z * z / trials
+        center = (proportion + z * z / (2 * trials)) / scale
+        half_width = (
+            z
+            * np.sqrt(
+                proportion * (1 - proportion) / trials + z * z / (4 * trials * trials)
+            )
+            / scale
+        )
+    lower = np.where(trials > 0, 100 * (center - half_width), np.nan)
+    upper = np.where(trials > 0, 100 * (center + half_width), np.nan)
+    return lower, upper
+
+
+def confidence_intervals(
+    aggregates,
+    interval_metrics,
+    replicates=BOOTSTRAP_REPLICATES,
+    level=CONFIDENCE_LEVEL,
+    seed=BOOTSTRAP_SEED,
+    first_month=None,
+    last_month=None,
+):
+    # bootstrap and Wilson intervals of every tracker row's metrics over the
+    # months first_month to last_month (the whole period by default). the
+    # bootstrap resamples a group's alerts as multinomial draws on its counts,
+    # so no alert is touched again
+    starts, stops = aggregates.window_positions(first_month, last_month)
+    counts, prop_counts, net_counts = (
+        row_count[:, 0] for row_count in aggregates.row_counts(starts, stops)
+    )
+    totals = counts.sum(axis=1)
+    cells = {
+        "counts": counts,
+        "prop": with_rest(prop_counts, totals),
+        "net": with_rest(net_counts, totals),
+    }
+
+    frame = aggregates.tracker.reset_index(drop=True)
+    rng = np.random.default_rng(seed)
+    for source in cells:
+        metrics = [
+            (name, numerator, denominator)
+            for name, metric_source, numerator, denominator in interval_metrics
+            if metric_source == source
+        ]
+        if not metrics:
+            continue
+        bootstrap = bootstrap_intervals(cells[source], metrics, replicates, level, rng)
+        for name, numerator, denominator in metrics:
+            successes = cells[source][:, numerator].sum(axis=1)
+            trials = cells[source][:, denominator].sum(axis=1)
+            wilson_lower, wilson_upper = wilson_interval(successes, trials, level)
+            frame[name] = percentage(successes, trials)
+            frame[f"{name} Bootstrap Lower"] = np.round(bootstrap[name][0], 2)
+            frame[f"{name} Bootstrap Upper"] = np.round(bootstrap[name][1], 2)
+            frame[f"{name} Wilson Lower"] = np.round(wilson_lower, 2)
+            frame[f"{name} Wilson Upper"] = np.round(wilson_upper, 2)
+    return frame
+
+
+def confidence_intervals_btl(
+    tracker,
+    sample_data,
+    registry=None,
+    replicates=BOOTSTRAP_REPLICATES,
+    level=CONFIDENCE_LEVEL,
+    seed=BOOTSTRAP_SEED,
+):
+    return confidence_intervals(
+        monthly_aggregates_btl(tracker, sample_data, registry),
+        BTL_INTERVAL_METRICS,
+        replicates,
+        level,
+        seed,
+    )
+
+
+def confidence_intervals_atl(
+    tracker,
+    dedupe_data,
+    registry=None,
+    replicates=BOOTSTRAP_REPLICATES,
+    level=CONFIDENCE_LEVEL,
+    seed=BOOTSTRAP_SEED,
+):
+    return confidence_intervals(
+        monthly_aggregates_atl(tracker, dedupe_data, registry),
+        ATL_INTERVAL_METRICS,
+        replicates,
+        level,
+        seed,
+    )
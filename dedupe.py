@@ -0,0 +1,122 @@
+import numpy as np
+import pandas as pd
+
+from ingest import iter_alert_chunks
+from rule_registry import load_rule_registry
+
+LATEST_RECORD_KEYS = ["Alert ID", "Rule ID", "Account Number"]
+TRANSACTION_KEYS = [
+    "Alert ID",
+    "Rule ID",
+    "Account Number",
+    "Transaction Date",
+    "Value_Parameter",
+]
+OUTPUT_COLUMNS = 50
+
+
+def first_occurrences(data, order, subset):
+    return order[~data[subset].take(order).duplicated().to_numpy()]
+
+
+def count_rules(rule_ids, counts=None):
+    # alerts per rule, kept in order of each rule's first appearance
+    counts = {} if counts is None else counts
+    chunk_counts = rule_ids.value_counts()
+    for rule in pd.unique(rule_ids.dropna()):
+        counts[rule] = counts.get(rule, 0) + chunk_counts[rule]
+    return counts
+
+
+def rule_order(counts):
+    # rules with the most alerts first; ties keep their first appearance
+    counts = pd.Series(counts, dtype=np.int64)
+    return counts.sort_values(ascending=False, kind="stable").index
+
+
+def dedupe_order(data, rules, registry):
+    # data needs a RangeIndex in extract order and no missing Rule IDs; rules
+    # gives the order the rules' blocks appear in, returns the surviving row
+    # positions. the registry decides which rules keep the latest record per
+    # alert/account and which the earliest record per transaction. both sorts
+    # are stable, so rows tied on their dates keep the earlier row of the
+    # extract, whatever else is read with them
+    rule_order = pd.Series(np.arange(len(rules)), index=rules)
+    latest_rules = pd.Series(
+        registry.keeps_latest_record(rules.to_series()), index=rules
+    )
+
+    rule_rank = data["Rule ID"].map(rule_order).to_numpy()
+    keep_latest = data["Rule ID"].map(latest_rules).to_numpy(dtype=bool)
+
+    latest_order = (
+        data.loc[keep_latest, ["Data Date", "Transaction Date"]]
+        .assign(_rule_order=rule_rank[keep_latest])
+        .sort_values(
+            by=["_rule_order", "Data Date", "Transaction Date"],
+            ascending=[True, False, False],
+            kind="stable",
+        )
+        .index.to_numpy()
+    )
+    latest_order = first_occurrences(data, latest_order, LATEST_RECORD_KEYS)
+
+    transaction_order = (
+        data.loc[~keep_latest, ["Data Date"]]
+        .assign(_rule_order=rule_rank[~keep_latest])
+        .sort_values(by=["_rule_order", "Data Date"], kind="stable")
+        .index.to_numpy()
+    )
+    transaction_order = first_occurrences(data, transaction_order, TRANSACTION_KEYS)
+
+    order = np.concatenate([latest_order, transaction_order])
+    return order[np.argsort(rule_rank[order], kind="stable")]
+
+
+def dedupe_alerts(data, registry=None):
+    if registry is None:
+        registry = load_rule_registry()
+    rules = rule_order(count_rules(data["Rule ID"]))
+    data = data[data["Rule ID"].notna()].reset_index(drop=True)
+    order = dedupe_order(data, rules, registry)
+    return data.take(order).iloc[:, :OUTPUT_COLUMNS].reset_index(drop=True)
+
+
+def dedupe_alert_chunks(chunks, registry=None):
+    # only the survivors so far plus one chunk are held in memory. survivors
+    # stay in extract order, so with the stable tie-break of dedupe_order the
+    # result is the same as dedupe_alerts() on the whole extract
+    if registry is None:
+        registry = load_rule_registry()
+    counts = {}
+    deduped = None
+    for chunk in chunks:
+        counts = count_rules(chunk["Rule ID"], counts)
+        chunk = chunk[chunk["Rule ID"].notna()]
+        if deduped is not None:
+            chunk = pd.concat([deduped, chunk])
+        chunk = chunk.reset_index(drop=True)
+        order = dedupe_order(chunk, pd.Index(chunk["Rule ID"].unique()), registry)
+        deduped = chunk.take(np.sort(order))
+
+    if deduped is None:
+        return pd.DataFrame()
+
+    deduped = deduped.reset_index(drop=True)
+    order = dedupe_order(deduped, rule_order(counts), registry)
+    return deduped.take(order).iloc[:, :OUTPUT_COLUMNS].reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    fp = "C:/Users/SprongJ/OneDrive - Crowe LLP/Documents/Non-Charge/Innovation Challenge/"  # update file path
+    updated_fp = "C:/Users/SprongJ/OneDrive - Crowe LLP/Documents/Non-Charge/Innovation Challenge/"  # update file path
+
+    chunks = iter_alert_chunks(
+        fp + "Actimize_Alerts_2022-05-31_to_2023-05-31 FINAL.xlsx",
+        sheet_name="Parsed Data",
+        columns=None,
+        dtype=None,
+    )  # Update name of file, confirm sheet
+
+    deduped = dedupe_alert_chunks(chunks)
+    deduped.to_csv(updated_fp + "Python Data Compare.csv", index=False)
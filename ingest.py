@@ -0,0 +1,287 @@
+import os
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from openpyxl.cell.cell import ERROR_CODES
+from pandas.io.parsers import TextParser
+
+DEFAULT_CHUNK_ROWS = 100_000
+PARAMETER_SUFFIX = "_Parameter"
+PIPELINE_COLUMNS = [
+    "Alert ID",
+    "Rule ID",
+    "Population Group",
+    "Account Number",
+    "Alert Date",
+    "Data Date",
+    "Transaction Date",
+    "Tuning Decision",
+]
+CATEGORY_COLUMNS = ["Rule ID", "Population Group", "Tuning Decision"]
+DATE_COLUMNS = ["Alert Date", "Data Date", "Transaction Date"]
+EXCEL_EXTENSIONS = [".xlsx", ".xlsm", ".xls"]
+# pyarrow.dataset formats, which apply the projection and row filters while
+# scanning instead of after the whole file is read
+ARROW_FORMATS = {".parquet": "parquet", ".arrow": "ipc", ".feather": "ipc"}
+
+
+def pipeline_column(name):
+    return name in PIPELINE_COLUMNS or str(name).endswith(PARAMETER_SUFFIX)
+
+
+def select_columns(names, columns):
+    if columns is None:
+        return list(range(len(names)))
+    if callable(columns):
+        return [i for i, name in enumerate(names) if columns(name)]
+    return [i for i, name in enumerate(names) if name in columns]
+
+
+def file_extension(file_path):
+    return os.path.splitext(str(file_path))[1].lower()
+
+
+def is_excel_file(file_path):
+    return file_extension(file_path) in EXCEL_EXTENSIONS
+
+
+def filter_mask(frame, filters, case_insensitive=()):
+    # filters maps a column to the values it may take; the columns named in
+    # case_insensitive are compared upper-cased on both sides
+    mask = np.ones(len(frame), dtype=bool)
+    for column, values in filters.items():
+        column_values = frame[column]
+        values = [str(value) for value in values]
+        if column in case_insensitive:
+            column_values = column_values.astype(object).str.upper()
+            values = [value.upper() for value in values]
+        mask &= column_values.isin(values).to_numpy()
+    return mask
+
+
+def filter_expression(filters, case_insensitive=()):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    expression = None
+    for column, values in filters.items():
+        field = pc.field(column).cast(pa.string())
+        values = [str(value) for value in values]
+        if column in case_insensitive:
+            field = pc.utf8_upper(field)
+            values = [value.upper() for value in values]
+        condition = field.isin(pa.array(values, type=pa.string()))
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+def convert_cell(value):
+    # same conversions pandas' openpyxl reader applies before parsing
+    if value is None:
+        return ""
+    if isinstance(value, str) and value in ERROR_CODES:
+        return np.nan
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if int(value) == value:
+            return int(value)
+        return float(value)
+    return value
+
+
+def convert_row(row):
+    values = [convert_cell(value) for value in row]
+    while values and values[-1] == "":
+        values.pop()
+    return values
+
+
+def parse_rows(names, rows, dtype, start):
+    frame = TextParser(
+        [names] + rows, header=0, dtype=dtype, skip_blank_lines=False
+    ).read()
+    frame.index = pd.RangeIndex(start, start + len(frame))
+    return frame
+
+
+def iter_excel_chunks(file_path, sheet_name, chunk_rows, columns, dtype):
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        if isinstance(sheet_name, int):
+            sheet = workbook.worksheets[sheet_name]
+        else:
+            sheet = workbook[sheet_name]
+        sheet.reset_dimensions()
+
+        rows = sheet.iter_rows(values_only=True)
+        header = convert_row(next(rows, ()))
+        keep = select_columns(header, columns)
+        names = [header[i] for i in keep]
+
+        chunk = []
+        blank_rows = 0
+        start = 0
+        for row in rows:
+            values = convert_row(row)
+            if not values:
+                # blank rows are only kept when more data follows them
+                blank_rows += 1
+                continue
+
+            chunk.extend([[""] * len(keep) for _ in range(blank_rows)])
+            blank_rows = 0
+            chunk.append([values[i] if i < len(values) else "" for i in keep])
+
+            if len(chunk) >= chunk_rows:
+                yield parse_rows(names, chunk, dtype, start)
+                start += len(chunk)
+                chunk = []
+
+        if chunk or start == 0:
+            yield parse_rows(names, chunk, dtype, start)
+    finally:
+        workbook.close()
+
+
+def iter_csv_chunks(file_path, chunk_rows, columns, dtype):
+    usecols = columns
+    if columns is not None and not callable(columns):
+        usecols = lambda name: name in columns
+    yield from pd.read_csv(
+        file_path, chunksize=chunk_rows, usecols=usecols, dtype=dtype
+    )
+
+
+def values_as_str(frame):
+    # match read_excel(dtype=str): every non-missing value becomes a str
+    for column in frame.columns:
+        values = frame[column]
+        frame[column] = values.map(str, na_action="ignore").where(
+            values.notna(), np.nan
+        )
+    return frame
+
+
+def iter_arrow_chunks(
+    file_path, chunk_rows, columns, dtype, filters=None, case_insensitive=()
+):
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(file_path, format=ARROW_FORMATS[file_extension(file_path)])
+    names = dataset.schema.names
+    selected = [names[i] for i in select_columns(names, columns)]
+    expression = filter_expression(filters, case_insensitive) if filters else None
+
+    start = 0
+    for batch in dataset.to_batches(
+        columns=selected, filter=expression, batch_size=chunk_rows
+    ):
+        if not batch.num_rows:
+            continue
+        frame = batch.to_pandas()
+        frame.index = pd.RangeIndex(start, start + len(frame))
+        start += len(frame)
+        yield values_as_str(frame) if dtype is str else frame
+
+    if start == 0:
+        frame = dataset.schema.empty_table().select(selected).to_pandas()
+        yield values_as_str(frame) if dtype is str else frame
+
+
+def filtered_chunks(chunks, filters, case_insensitive=()):
+    for chunk in chunks:
+        yield chunk[filter_mask(chunk, filters, case_insensitive)]
+
+
+def iter_alert_chunks(
+    file_path,
+    sheet_name=0,
+    chunk_rows=DEFAULT_CHUNK_ROWS,
+    columns=pipeline_column,
+    dtype=str,
+    filters=None,
+    case_insensitive=(),
+):
+    # filters keeps only the rows whose columns take one of the given values
+    # (e.g. the tracker's Rule IDs); Parquet and Arrow files skip the other
+    # rows while scanning, CSV and workbooks drop them chunk by chunk
+    extension = file_extension(file_path)
+    if extension in ARROW_FORMATS:
+        return iter_arrow_chunks(
+            file_path, chunk_rows, columns, dtype, filters, case_insensitive
+        )
+    elif extension == ".csv":
+        chunks = iter_csv_chunks(file_path, chunk_rows, columns, dtype)
+    else:
+        chunks = iter_excel_chunks(file_path, sheet_name, chunk_rows, columns, dtype)
+    if filters:
+        return filtered_chunks(chunks, filters, case_insensitive)
+    return chunks
+
+
+def read_alerts(
+    file_path,
+    sheet_name=0,
+    chunk_rows=DEFAULT_CHUNK_ROWS,
+    columns=pipeline_column,
+    dtype=str,
+    filters=None,
+    case_insensitive=(),
+):
+    return pd.concat(
+        iter_alert_chunks(
+            file_path,
+            sheet_name,
+            chunk_rows,
+            columns,
+            dtype,
+            filters,
+            case_insensitive,
+        )
+    )
+
+
+def write_frame(data, file_path, sheet_name="Sheet1"):
+    extension = file_extension(file_path)
+    if extension == ".csv":
+        data.to_csv(file_path, index=False)
+    elif extension == ".parquet":
+        data.to_parquet(file_path, index=False)
+    elif extension in (".arrow", ".feather"):
+        data.reset_index(drop=True).to_feather(file_path)
+    elif extension in EXCEL_EXTENSIONS:
+        data.to_excel(file_path, sheet_name=sheet_name, index=False)
+    else:
+        raise ValueError(f"Unknown output format: {extension}")
+
+
+def apply_alert_schema(data):
+    # categories for the grouping keys, float64 parameters and datetime64 dates,
+    # so later stages never re-parse strings
+    data = data.copy()
+    for column in data.columns:
+        if column in CATEGORY_COLUMNS:
+            data[column] = data[column].astype("category")
+        elif str(column).endswith(PARAMETER_SUFFIX):
+            data[column] = pd.to_numeric(data[column], errors="coerce").astype(float)
+        elif column in DATE_COLUMNS:
+            data[column] = pd.to_datetime(data[column], errors="coerce")
+    return data
+
+
+def memory_report(before, after):
+    report = pd.DataFrame(
+        {
+            "Before (bytes)": before.memory_usage(index=False, deep=True),
+            "After (bytes)": after.memory_usage(index=False, deep=True),
+        }
+    )
+    report["Before dtype"] = before.dtypes.astype(str)
+    report["After dtype"] = after.dtypes.astype(str)
+    report.loc["Total"] = [
+        report["Before (bytes)"].sum(),
+        report["After (bytes)"].sum(),
+        "",
+        "",
+    ]
+    return report
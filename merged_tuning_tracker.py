@@ -1,9 +1,241 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+from alert_store import AlertStore
+from ingest import (
+    apply_alert_schema,
+    filter_mask,
+    is_excel_file,
+    iter_alert_chunks,
+    memory_report,
+    pipeline_column,
+    read_alerts,
+    select_columns,
+    write_frame,
+)
+from rule_registry import load_rule_registry
+from run_report import new_run_report, run_stage, write_run_report
+from threshold_sweep import (
+    count_passing,
+    cumulative_decision_counts,
+    sweep_thresholds_atl,
+    sweep_thresholds_btl,
+)
+
+GROUP_KEYS = ["Rule ID", "Population Group"]
+CACHE_DIR_NAME = ".tm_cache"
+MAX_EXCEL_ROWS = 1_048_576
+STREAM_CHUNK_ROWS = 50_000
+OPERATOR_UFUNCS = {
+    ">=": np.greater_equal,
+    ">": np.greater,
+    "<=": np.less_equal,
+    "<": np.less,
+}
+INCREMENTAL_STATE_VERSION = 1
+FINGERPRINT_COLUMNS = [
+    "Rule ID",
+    "Population Group",
+    "Parameter Type",
+    "Operator",
+    "Recommended Threshold",
+]
+COLUMNS_TO_ADD_BTL = [
+    "Num Alerts Extracted",
+    "Num Alerts Sampled",
+    "Interesting Alerts",
+    "Not Interesting Alerts",
+    "Data Quality Alerts",
+    "Effectiveness",
+    "Prop Interesting Alerts",
+    "Prop Not Interesting Alerts",
+    "Prop Effectiveness",
+    "Net Effectiveness",
+    "Min Val",
+    "Max Val",
+]
+COLUMNS_TO_ADD_ATL = [
+    "Num Alerts Extracted",
+    "SARs Filed",
+    "Interesting Alerts",
+    "Not Interesting Alerts",
+    "Data Quality Alerts",
+    "Effectiveness",
+    "SAR Yield",
+    "Prop SARs Filed",
+    "Prop Interesting Alerts",
+    "Prop Not Interesting Alerts",
+    "Prop Effectiveness",
+    "Prop SAR Yield",
+    "Not Interesting Alert Reduction",
+    "Net Effectiveness",
+    "Net SAR Yield",
+    "Net Not Interesting Alert Reduction",
+    "Min Val",
+    "Max Val",
+    "Alert Count",
+    "Proposed Alert Count",
+    "Proposed Alert Reduction",
+]
+RESULT_COLUMNS_BTL = [
+    "Num Alerts Extracted",
+    "Num Alerts Sampled",
+    "Interesting Alerts",
+    "Not Interesting Alerts",
+    "Data Quality Alerts",
+    "Prop Interesting Alerts",
+    "Prop Not Interesting Alerts",
+    "Min Val",
+    "Max Val",
+    "Net Effectiveness",
+]
+RESULT_COLUMNS_ATL = [
+    "Num Alerts Extracted",
+    "SARs Filed",
+    "Interesting Alerts",
+    "Not Interesting Alerts",
+    "Data Quality Alerts",
+    "Prop SARs Filed",
+    "Prop Interesting Alerts",
+    "Prop Not Interesting Alerts",
+    "Min Val",
+    "Max Val",
+    "Net Effectiveness",
+    "Net SAR Yield",
+    "Net Not Interesting Alert Reduction",
+    "Alert Count",
+    "Proposed Alert Count",
+]
+
+
+def file_digest(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def default_cache_dir(file_path):
+    return os.path.join(os.path.dirname(file_path), CACHE_DIR_NAME)
+
+
+def cached_file_digest(file_path, cache_dir):
+    # only rehash the workbook when its mtime or size has changed; an index
+    # that cannot be read (e.g. cut short by an interrupted run) is a miss,
+    # and one that cannot be written (e.g. a read-only folder) is skipped
+    index_path = os.path.join(cache_dir, "index.json")
+    index = {}
+    if os.path.exists(index_path):
+        try:
+            with open(index_path) as handle:
+                index = json.load(handle)
+        except (OSError, ValueError):
+            index = {}
+
+    stat = os.stat(file_path)
+    key = os.path.abspath(file_path)
+    entry = index.get(key)
+    if entry and entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+        return entry["digest"]
+
+    digest = file_digest(file_path)
+    index[key] = {"mtime": stat.st_mtime_ns, "size": stat.st_size, "digest": digest}
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(index_path + ".tmp", "w") as handle:
+            json.dump(index, handle, indent=2)
+        os.replace(index_path + ".tmp", index_path)
+    except OSError as error:
+        print(f"Not caching the digest of {file_path}: {error}")
+    return digest
+
+
+def read_cached_frame(cache_file):
+    frame = pd.read_parquet(cache_file)
+    for column in frame.columns[frame.dtypes == object]:
+        frame[column] = frame[column].where(frame[column].notna(), np.nan)
+    return frame
+
+
+def read_excel(file_path, sheet_name=0, dtype=str, cache_dir=None, use_cache=True):
+    if not use_cache or not isinstance(sheet_name, (int, str)):
+        return pd.read_excel(file_path, sheet_name=sheet_name, dtype=dtype)
+
+    if cache_dir is None:
+        cache_dir = default_cache_dir(file_path)
+
+    digest = cached_file_digest(file_path, cache_dir)
+    cache_key = hashlib.sha256(f"{digest}|{sheet_name!r}|{dtype!r}".encode())
+    cache_file = os.path.join(cache_dir, cache_key.hexdigest()[:32] + ".parquet")
+
+    if os.path.exists(cache_file):
+        try:
+            return read_cached_frame(cache_file)
+        except ImportError:
+            return pd.read_excel(file_path, sheet_name=sheet_name, dtype=dtype)
+
+    frame = pd.read_excel(file_path, sheet_name=sheet_name, dtype=dtype)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        frame.to_parquet(cache_file + ".tmp", index=False)
+        os.replace(cache_file + ".tmp", cache_file)
+    except (ImportError, ValueError, TypeError, OSError) as error:
+        # pyarrow is optional, some mixed-type sheets cannot be stored and
+        # the cache folder may not be writable
+        print(f"Not caching {file_path} ({sheet_name}): {error}")
+        if os.path.exists(cache_file + ".tmp"):
+            os.remove(cache_file + ".tmp")
+    return frame
+
+
+def read_table(
+    file_path,
+    sheet_name=0,
+    dtype=str,
+    cache_dir=None,
+    columns=None,
+    filters=None,
+    case_insensitive=(),
+):
+    # workbooks go through the parse cache and are projected and filtered once
+    # read; CSV, Parquet and Arrow files are read with both applied by the
+    # reader
+    if not is_excel_file(file_path):
+        return read_alerts(
+            file_path,
+            sheet_name,
+            columns=columns,
+            dtype=dtype,
+            filters=filters,
+            case_insensitive=case_insensitive,
+        )
 
-
-def read_excel(file_path, sheet_name=0, dtype=str):
-    return pd.read_excel(file_path, sheet_name=sheet_name, dtype=dtype)
+    data = read_excel(file_path, sheet_name, dtype, cache_dir)
+    if columns is not None:
+        data = data.iloc[:, select_columns(list(data.columns), columns)]
+    if filters:
+        data = data[filter_mask(data, filters, case_insensitive)]
+    return data
+
+
+def type_alerts(data, name, report=False):
+    # the memory report measures every object column of both frames, so it
+    # is only printed when asked for
+    typed_data = apply_alert_schema(data)
+    if report:
+        totals = memory_report(data, typed_data).loc["Total"]
+        print(
+            f"{name}: {totals['Before (bytes)'] / 1e6:.1f} MB as text, "
+            f"{totals['After (bytes)'] / 1e6:.1f} MB typed"
+        )
+    return typed_data
 
 
 def filter_tracker(tracker, is_tunable):
@@ -26,264 +258,462 @@ def calculate_date_range(data, date_column):
     return f"{first_day_earliest_month.strftime('%m/%d/%Y')} - {last_day_latest_month.strftime('%m/%d/%Y')}"
 
 
-def populate_current_result_info_btl(tracker, delta_data, sample_data):
-    for index, row in tracker.iterrows():
-        rule = row["Rule ID"]
-        population_group = row["Population Group"]
-        parameter_type = row["Parameter Type"]
-        operator = row["Operator"]
-        threshold = float(row["Recommended Threshold"])
+def aggregate_alert_counts(rule_ids, alert_data, decisions=()):
+    keys = pd.DataFrame(
+        {
+            "Rule ID": rule_ids.to_numpy(),
+            "Population Group": alert_data["Population Group"].to_numpy(),
+        }
+    )
+    for decision in decisions:
+        keys[decision] = (alert_data["Tuning Decision"] == decision).to_numpy()
+
+    grouped = keys.dropna(subset=GROUP_KEYS).groupby(GROUP_KEYS)
+    counts = grouped[list(decisions)].sum()
+    counts.insert(0, "Alerts", grouped.size())
+    return counts
 
-        delta_data_filtered = delta_data[
-            (delta_data["Rule ID"] == rule)
-            & (delta_data["Population Group"] == population_group)
-        ]
-        sample_data_filtered = sample_data[
-            (sample_data["Rule ID"] == rule)
-            & (sample_data["Population Group"] == population_group)
-        ]
 
-        tracker.at[index, "Num Alerts Extracted"] = len(delta_data_filtered)
-        tracker.at[index, "Num Alerts Sampled"] = len(sample_data_filtered)
-        tracker.at[index, "Interesting Alerts"] = len(
-            sample_data_filtered[
-                sample_data_filtered["Tuning Decision"] == "Interesting"
-            ]
+def aggregate_threshold_results(
+    tracker, tracker_rule_ids, parameter_types, alert_data, alert_rule_ids, decisions
+):
+    # per parameter, the alerts are sorted once by group and then value, as
+    # an integer key of group code and value rank; each row's pass counts are
+    # two searches into the cumulative decision counts, and its Min / Max Val
+    # the ends of its group's run
+    thresholds = tracker["Recommended Threshold"].astype(float).to_numpy()
+    parameter_types = np.asarray(parameter_types, dtype=object)
+
+    results = pd.DataFrame(0, index=np.arange(len(tracker)), columns=list(decisions))
+    results["Min Val"] = np.nan
+    results["Max Val"] = np.nan
+
+    # a group's code is its rule code times the number of population groups
+    # plus its population group code; rows without alerts get -1
+    rule_codes, rules = pd.factorize(alert_rule_ids)
+    population_codes, populations = pd.factorize(alert_data["Population Group"])
+    valid = (rule_codes >= 0) & (population_codes >= 0)
+    group_codes = (rule_codes * len(populations) + population_codes)[valid]
+    row_rules = pd.Index(rules).get_indexer(tracker_rule_ids)
+    row_populations = pd.Index(populations).get_indexer(tracker["Population Group"])
+    row_groups = np.where(
+        (row_rules >= 0) & (row_populations >= 0),
+        row_rules * len(populations) + row_populations,
+        -1,
+    )
+    decision_codes = pd.Categorical(
+        alert_data["Tuning Decision"], categories=list(decisions)
+    ).codes.astype(np.int64)[valid]
+
+    for parameter_type in pd.unique(parameter_types):
+        values = pd.to_numeric(alert_data[parameter_type], errors="coerce")
+        values = values.to_numpy(dtype=float)[valid]
+        present = ~np.isnan(values)
+        ranked, ranks = np.unique(values[present], return_inverse=True)
+        stride = len(ranked) + 1
+        keys = np.full(len(values), np.nan)
+        keys[present] = group_codes[present] * stride + ranks.reshape(-1)
+        sorted_keys, cumulative = cumulative_decision_counts(
+            keys, decision_codes, len(decisions)
         )
-        tracker.at[index, "Not Interesting Alerts"] = len(
-            sample_data_filtered[
-                sample_data_filtered["Tuning Decision"] == "Not Interesting"
-            ]
+
+        selected = np.flatnonzero(
+            (parameter_types == parameter_type) & (row_groups >= 0)
         )
-        tracker.at[index, "Data Quality Alerts"] = len(
-            sample_data_filtered[
-                sample_data_filtered["Tuning Decision"] == "Data Quality"
-            ]
+        group_start = row_groups[selected] * stride
+        group_stop = group_start + stride
+        threshold_keys = group_start + np.searchsorted(
+            ranked, thresholds[selected], side="left"
         )
+        passing = count_passing(
+            sorted_keys, cumulative, threshold_keys, ">="
+        ) - count_passing(sorted_keys, cumulative, group_stop, ">=")
+        results.loc[selected, list(decisions)] = passing.T
+
+        start = np.searchsorted(sorted_keys, group_start, side="left")
+        stop = np.searchsorted(sorted_keys, group_stop, side="left")
+        has_values = stop > start
+        results.loc[selected[has_values], "Min Val"] = ranked[
+            (sorted_keys[start[has_values]] - group_start[has_values]).astype(np.int64)
+        ]
+        results.loc[selected[has_values], "Max Val"] = ranked[
+            (sorted_keys[stop[has_values] - 1] - group_start[has_values]).astype(
+                np.int64
+            )
+        ]
 
-        alerts = sample_data_filtered.copy()
-        alerts[parameter_type] = pd.to_numeric(alerts[parameter_type], errors="coerce")
+    return results
 
-        prop_interesting = alerts[
-            (alerts["Tuning Decision"] == "Interesting")
-            & (alerts[parameter_type] >= threshold)
-        ].shape[0]
-        prop_notinteresting = alerts[
-            (alerts["Tuning Decision"] == "Not Interesting")
-            & (alerts[parameter_type] >= threshold)
-        ].shape[0]
 
-        tracker.at[index, "Prop Interesting Alerts"] = prop_interesting
-        tracker.at[index, "Prop Not Interesting Alerts"] = prop_notinteresting
+def alert_frame(alert_data):
+    if isinstance(alert_data, AlertStore):
+        return alert_data.data
+    return alert_data
 
-        values = alerts[parameter_type].dropna()
-        tracker.at[index, "Min Val"] = values.min() if not values.empty else np.nan
-        tracker.at[index, "Max Val"] = values.max() if not values.empty else np.nan
 
-    return tracker
+def as_chunks(data):
+    if isinstance(data, pd.DataFrame):
+        return [data]
+    return data
 
 
-def populate_current_result_info_atl(tracker, dedupe_data):
-    for index, row in tracker.iterrows():
-        rule = row["Rule ID"].upper()
-        population_group = row["Population Group"]
-        # parameter_type = row["Parameter Type"]
-        # !!!! change log v1: the above line is changed to the following line TODO: check if this is correct
-        parameter_type = "Occurrence_Parameter"
-        threshold = float(row["Recommended Threshold"])
+def combine_alert_counts(parts):
+    if len(parts) == 1:
+        return parts[0]
+    return pd.concat(parts).groupby(level=GROUP_KEYS).sum()
+
+
+def combine_threshold_results(parts):
+    combined = parts[0].copy()
+    counts = combined.columns.drop(["Min Val", "Max Val"])
+    for part in parts[1:]:
+        combined[counts] += part[counts]
+        combined["Min Val"] = np.fmin(combined["Min Val"], part["Min Val"])
+        combined["Max Val"] = np.fmax(combined["Max Val"], part["Max Val"])
+    return combined
+
+
+def lookup_group_aggregates(rule_ids, population_groups, aggregates):
+    index = pd.MultiIndex.from_arrays(
+        [rule_ids.to_numpy(), population_groups.to_numpy()], names=GROUP_KEYS
+    )
+    return aggregates.reindex(index, fill_value=0)
 
-        dedupe_data_filtered = dedupe_data[
-            (dedupe_data["Rule ID"].str.upper() == rule)
-            & (dedupe_data["Population Group"] == population_group)
+
+def count_delta_alerts(delta_data):
+    # the delta extract is only counted, so it can also arrive in chunks
+    return combine_alert_counts(
+        [
+            aggregate_alert_counts(chunk["Rule ID"], chunk)
+            for chunk in as_chunks(delta_data)
         ]
+    )
+
+
+def populate_current_result_info_btl(
+    tracker, delta_data, sample_data, delta_counts=None
+):
+    decisions = ["Interesting", "Not Interesting", "Data Quality"]
+    tracker_rules = tracker["Rule ID"]
+    sample_data = alert_frame(sample_data)
+
+    if delta_counts is None:
+        delta_counts = count_delta_alerts(delta_data)
+    delta_counts = lookup_group_aggregates(
+        tracker_rules, tracker["Population Group"], delta_counts
+    )
+    sample_counts = lookup_group_aggregates(
+        tracker_rules,
+        tracker["Population Group"],
+        aggregate_alert_counts(sample_data["Rule ID"], sample_data, decisions),
+    )
+    proposed = aggregate_threshold_results(
+        tracker,
+        tracker_rules,
+        tracker["Parameter Type"],
+        sample_data,
+        sample_data["Rule ID"],
+        ["Interesting", "Not Interesting"],
+    )
 
-        tracker.at[index, "Num Alerts Extracted"] = len(dedupe_data_filtered)
-        tracker.at[index, "SARs Filed"] = len(
-            dedupe_data_filtered[dedupe_data_filtered["Tuning Decision"] == "SAR Filed"]
-        )
-        tracker.at[index, "Interesting Alerts"] = len(
-            dedupe_data_filtered[
-                dedupe_data_filtered["Tuning Decision"] == "Interesting"
-            ]
-        )
-        tracker.at[index, "Not Interesting Alerts"] = len(
-            dedupe_data_filtered[
-                dedupe_data_filtered["Tuning Decision"] == "Not Interesting"
-            ]
-        )
-        tracker.at[index, "Data Quality Alerts"] = len(
-            dedupe_data_filtered[
-                dedupe_data_filtered["Tuning Decision"] == "Data Quality"
-            ]
-        )
-
-        alerts = dedupe_data_filtered.copy()
-        alerts[parameter_type] = pd.to_numeric(alerts[parameter_type], errors="coerce")
-
-        prop_SAR = alerts[
-            (alerts["Tuning Decision"] == "SAR Filed")
-            & (alerts[parameter_type] >= threshold)
-        ].shape[0]
-        prop_interesting = alerts[
-            (alerts["Tuning Decision"] == "Interesting")
-            & (alerts[parameter_type] >= threshold)
-        ].shape[0]
-        prop_notinteresting = alerts[
-            (alerts["Tuning Decision"] == "Not Interesting")
-            & (alerts[parameter_type] >= threshold)
-        ].shape[0]
-
-        tracker.at[index, "Prop SARs Filed"] = prop_SAR
-        tracker.at[index, "Prop Interesting Alerts"] = prop_interesting
-        tracker.at[index, "Prop Not Interesting Alerts"] = prop_notinteresting
-
-        values = alerts[parameter_type].dropna()
-        tracker.at[index, "Min Val"] = values.min() if not values.empty else np.nan
-        tracker.at[index, "Max Val"] = values.max() if not values.empty else np.nan
+    tracker["Num Alerts Extracted"] = delta_counts["Alerts"].to_numpy(dtype=float)
+    tracker["Num Alerts Sampled"] = sample_counts["Alerts"].to_numpy(dtype=float)
+    tracker["Interesting Alerts"] = sample_counts["Interesting"].to_numpy(dtype=float)
+    tracker["Not Interesting Alerts"] = sample_counts["Not Interesting"].to_numpy(
+        dtype=float
+    )
+    tracker["Data Quality Alerts"] = sample_counts["Data Quality"].to_numpy(dtype=float)
+    tracker["Prop Interesting Alerts"] = proposed["Interesting"].to_numpy(dtype=float)
+    tracker["Prop Not Interesting Alerts"] = proposed["Not Interesting"].to_numpy(
+        dtype=float
+    )
+    tracker["Min Val"] = proposed["Min Val"].to_numpy(dtype=float)
+    tracker["Max Val"] = proposed["Max Val"].to_numpy(dtype=float)
 
     return tracker
 
 
-def calculate_net_effectiveness_btl(tracker, sample_data):
-    for rule in tracker["Rule ID"].unique():
-        tracker_rule = tracker[tracker["Rule ID"] == rule]
-        for group in tracker_rule["Population Group"].unique():
-            tracker_rule_group = tracker_rule[tracker_rule["Population Group"] == group]
-            net_alerts = sample_data[
-                (sample_data["Rule ID"] == rule)
-                & (sample_data["Population Group"] == group)
-            ]
-
-            for index, row in tracker_rule_group.iterrows():
-                # param = row["Parameter Type"]
-                # !!!! change log v1: the above line is changed to the following line TODO: check if this is correct
-                param = "Occurrence_Parameter"
-
-                oper = row["Operator"]
-                rec = float(row["Recommended Threshold"])
-
-                if oper == ">=":
-                    condition = net_alerts[param].astype(float) >= rec
-                elif oper == ">":
-                    condition = net_alerts[param].astype(float) > rec
-                elif oper == "<=":
-                    condition = net_alerts[param].astype(float) <= rec
-                elif oper == "<":
-                    condition = net_alerts[param].astype(float) < rec
-                else:
-                    raise ValueError(f"Unknown operator: {oper}")
-
-                net_alerts = net_alerts[condition]
-
-            net_interesting = len(
-                net_alerts[net_alerts["Tuning Decision"] == "Interesting"]
-            )
-            net_notinteresting = len(
-                net_alerts[net_alerts["Tuning Decision"] == "Not Interesting"]
-            )
+def populate_current_result_info_atl(tracker, dedupe_data, registry=None):
+    decisions = ["SAR Filed", "Interesting", "Not Interesting", "Data Quality"]
+    if registry is None:
+        registry = load_rule_registry()
+    tracker_rules = tracker["Rule ID"].str.upper()
+    parameter_types = registry.threshold_parameters(tracker, tracker_rules)
 
-            net_effectiveness = (
-                round(100 * net_interesting / (net_interesting + net_notinteresting), 2)
-                if (net_interesting + net_notinteresting) > 0
-                else 0
-            )
+    if isinstance(dedupe_data, AlertStore):
+        # the store already holds the upper-cased Rule IDs
+        chunks = [(dedupe_data.data, dedupe_data.rule_keys)]
+    else:
+        chunks = (
+            (chunk, chunk["Rule ID"].str.upper()) for chunk in as_chunks(dedupe_data)
+        )
 
-            tracker.loc[tracker_rule_group.index, "Net Effectiveness"] = (
-                net_effectiveness
+    count_parts = []
+    proposed_parts = []
+    for chunk, alert_rules in chunks:
+        count_parts.append(aggregate_alert_counts(alert_rules, chunk, decisions))
+        proposed_parts.append(
+            aggregate_threshold_results(
+                tracker,
+                tracker_rules,
+                parameter_types,
+                chunk,
+                alert_rules,
+                ["SAR Filed", "Interesting", "Not Interesting"],
             )
+        )
+
+    counts = lookup_group_aggregates(
+        tracker_rules, tracker["Population Group"], combine_alert_counts(count_parts)
+    )
+    proposed = combine_threshold_results(proposed_parts)
+
+    tracker["Num Alerts Extracted"] = counts["Alerts"].to_numpy(dtype=float)
+    tracker["SARs Filed"] = counts["SAR Filed"].to_numpy(dtype=float)
+    tracker["Interesting Alerts"] = counts["Interesting"].to_numpy(dtype=float)
+    tracker["Not Interesting Alerts"] = counts["Not Interesting"].to_numpy(dtype=float)
+    tracker["Data Quality Alerts"] = counts["Data Quality"].to_numpy(dtype=float)
+    tracker["Prop SARs Filed"] = proposed["SAR Filed"].to_numpy(dtype=float)
+    tracker["Prop Interesting Alerts"] = proposed["Interesting"].to_numpy(dtype=float)
+    tracker["Prop Not Interesting Alerts"] = proposed["Not Interesting"].to_numpy(
+        dtype=float
+    )
+    tracker["Min Val"] = proposed["Min Val"].to_numpy(dtype=float)
+    tracker["Max Val"] = proposed["Max Val"].to_numpy(dtype=float)
 
     return tracker
 
 
-def calculate_net_effectiveness_atl(tracker, dedupe_data):
-    net_alerts_final = pd.DataFrame()
+def partition_by_rule(data, rule_ids):
+    return dict(tuple(data.groupby(rule_ids, sort=False, observed=True)))
 
-    for rule in tracker["Rule ID"].unique():
-        tracker_rule = tracker[tracker["Rule ID"].str.upper() == rule.upper()]
-        for group in tracker_rule["Population Group"].unique():
-            tracker_rule_group = tracker_rule[tracker_rule["Population Group"] == group]
-            net_alerts = dedupe_data[
-                (dedupe_data["Rule ID"] == rule)
-                & (dedupe_data["Population Group"] == group)
-            ]
-            net_alerts_count = net_alerts["Alert ID"].nunique()
-
-            for index, row in tracker_rule_group.iterrows():
-                # param = row["Parameter Type"]
-                # !!!! change log v1: the above line is changed to the following line TODO: check if this is correct
-                param = "Occurrence_Parameter"
-
-                oper = row["Operator"]
-                rec = float(row["Recommended Threshold"])
-
-                net_alerts.loc[:, param] = pd.to_numeric(net_alerts[param])
-                if oper == ">=":
-                    condition = net_alerts[param] >= rec
-                elif oper == ">":
-                    condition = net_alerts[param] > rec
-                elif oper == "<=":
-                    condition = net_alerts[param] <= rec
-                elif oper == "<":
-                    condition = net_alerts[param] < rec
-                else:
-                    raise ValueError(f"Unknown operator: {oper}")
-
-                net_alerts = net_alerts[condition]
-
-            net_SAR = len(net_alerts[net_alerts["Tuning Decision"] == "SAR Filed"])
-            net_interesting = len(
-                net_alerts[net_alerts["Tuning Decision"] == "Interesting"]
-            )
-            net_notinteresting = len(
-                net_alerts[net_alerts["Tuning Decision"] == "Not Interesting"]
-            )
-            net_alerts_filtered_count = net_alerts["Alert ID"].nunique()
 
-            net_alerts_final = pd.concat([net_alerts_final, net_alerts])
+def map_rules(
+    function, rules, tracker_parts, alert_parts, parameter_parts, workers=None
+):
+    if not workers or workers <= 1:
+        return list(map(function, rules, tracker_parts, alert_parts, parameter_parts))
 
-            net_effectiveness = (
-                round(
-                    100
-                    * (net_interesting + net_SAR)
-                    / (net_SAR + net_interesting + net_notinteresting),
-                    2,
-                )
-                if (net_SAR + net_interesting + net_notinteresting) > 0
-                else 0
-            )
-            net_SAR_yield = (
-                round(
-                    100 * net_SAR / (net_SAR + net_interesting + net_notinteresting), 2
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(
+            executor.map(function, rules, tracker_parts, alert_parts, parameter_parts)
+        )
+
+
+def threshold_mask(values, tracker_rows, parameters):
+    # every tracker row of a group must pass, so their conditions are ANDed
+    # into one mask instead of filtering the alerts row by row; values holds
+    # the alerts' column for each row's threshold parameter
+    mask = np.ones(len(next(iter(values.values()))), dtype=bool)
+    for oper, rec, param in zip(
+        tracker_rows["Operator"], tracker_rows["Recommended Threshold"], parameters
+    ):
+        rec = float(rec)
+        if oper not in OPERATOR_UFUNCS:
+            raise ValueError(f"Unknown operator: {oper}")
+        mask &= OPERATOR_UFUNCS[oper](values[param], rec)
+    return mask
+
+
+def decision_counts(tuning_decisions, decisions, mask):
+    codes = pd.Categorical(tuning_decisions, categories=decisions).codes[mask]
+    return np.bincount(codes[codes >= 0], minlength=len(decisions))
+
+
+def net_effectiveness_btl_rule(rule, tracker_rule, rule_alerts, rule_parameters):
+    updates = []
+    for group in tracker_rule["Population Group"].unique():
+        tracker_rule_group = tracker_rule[tracker_rule["Population Group"] == group]
+        net_alerts = rule_alerts[group]
+        parameters = rule_parameters[tracker_rule_group.index]
+
+        values = {}
+        for param in parameters.unique():
+            param_values = net_alerts[param]
+            if not is_numeric_dtype(param_values):
+                param_values = param_values.astype(float)
+            values[param] = param_values.to_numpy(dtype=float)
+        mask = threshold_mask(values, tracker_rule_group, parameters)
+
+        net_interesting, net_notinteresting = decision_counts(
+            net_alerts["Tuning Decision"], ["Interesting", "Not Interesting"], mask
+        )
+
+        net_effectiveness = (
+            round(100 * net_interesting / (net_interesting + net_notinteresting), 2)
+            if (net_interesting + net_notinteresting) > 0
+            else 0
+        )
+
+        updates.append(
+            (tracker_rule_group.index, {"Net Effectiveness": net_effectiveness})
+        )
+
+    return updates, []
+
+
+def net_effectiveness_atl_rule(rule, tracker_rule, rule_alerts, rule_parameters):
+    updates = []
+    net_alerts_parts = []
+    for group in tracker_rule["Population Group"].unique():
+        tracker_rule_group = tracker_rule[tracker_rule["Population Group"] == group]
+        net_alerts = rule_alerts[group]
+        net_alerts_count = net_alerts["Alert ID"].nunique()
+        parameters = rule_parameters[tracker_rule_group.index]
+
+        for param in parameters.unique():
+            if not is_numeric_dtype(net_alerts[param]):
+                net_alerts = net_alerts.assign(
+                    **{param: pd.to_numeric(net_alerts[param])}
                 )
-                if (net_SAR + net_interesting + net_notinteresting) > 0
-                else 0
+        mask = threshold_mask(
+            {
+                param: net_alerts[param].to_numpy(dtype=float)
+                for param in parameters.unique()
+            },
+            tracker_rule_group,
+            parameters,
+        )
+
+        net_SAR, net_interesting, net_notinteresting = decision_counts(
+            net_alerts["Tuning Decision"],
+            ["SAR Filed", "Interesting", "Not Interesting"],
+            mask,
+        )
+        net_alerts = net_alerts[mask]
+        net_alerts_filtered_count = net_alerts["Alert ID"].nunique()
+
+        net_alerts_parts.append(((rule, group), net_alerts))
+
+        net_effectiveness = (
+            round(
+                100
+                * (net_interesting + net_SAR)
+                / (net_SAR + net_interesting + net_notinteresting),
+                2,
             )
-            initial_not_interesting = tracker_rule_group["Not Interesting Alerts"].iloc[
-                0
-            ]
-            net_notinterestingreduction = (
-                round(
-                    100
-                    * (initial_not_interesting - net_notinteresting)
-                    / initial_not_interesting,
-                    2,
-                )
-                if initial_not_interesting > 0
-                else 0
+            if (net_SAR + net_interesting + net_notinteresting) > 0
+            else 0
+        )
+        net_SAR_yield = (
+            round(100 * net_SAR / (net_SAR + net_interesting + net_notinteresting), 2)
+            if (net_SAR + net_interesting + net_notinteresting) > 0
+            else 0
+        )
+        initial_not_interesting = tracker_rule_group["Not Interesting Alerts"].iloc[0]
+        net_notinterestingreduction = (
+            round(
+                100
+                * (initial_not_interesting - net_notinteresting)
+                / initial_not_interesting,
+                2,
             )
+            if initial_not_interesting > 0
+            else 0
+        )
 
-            tracker.loc[tracker_rule_group.index, "Net Effectiveness"] = (
-                net_effectiveness
-            )
-            tracker.loc[tracker_rule_group.index, "Net SAR Yield"] = net_SAR_yield
-            tracker.loc[
-                tracker_rule_group.index, "Net Not Interesting Alert Reduction"
-            ] = net_notinterestingreduction
-            tracker.loc[tracker_rule_group.index, "Alert Count"] = net_alerts_count
-            tracker.loc[tracker_rule_group.index, "Proposed Alert Count"] = (
-                net_alerts_filtered_count
+        updates.append(
+            (
+                tracker_rule_group.index,
+                {
+                    "Net Effectiveness": net_effectiveness,
+                    "Net SAR Yield": net_SAR_yield,
+                    "Net Not Interesting Alert Reduction": net_notinterestingreduction,
+                    "Alert Count": net_alerts_count,
+                    "Proposed Alert Count": net_alerts_filtered_count,
+                },
             )
+        )
+
+    return updates, net_alerts_parts
+
+
+def calculate_net_effectiveness(
+    tracker,
+    alert_data,
+    rule_function,
+    case_insensitive=False,
+    workers=None,
+    registry=None,
+):
+    # each rule is independent: partition once, run serially or in a process
+    # pool, then apply the results in the original rule order; every rule
+    # gets its groups' alerts as slices of the store and the threshold
+    # parameter of each of its tracker rows
+    if not isinstance(alert_data, AlertStore):
+        alert_data = AlertStore(alert_data, case_insensitive)
+    if registry is None:
+        registry = load_rule_registry()
+    rules = tracker["Rule ID"].unique()
+    tracker_rule_ids = tracker["Rule ID"]
+    rule_keys = rules
+    if case_insensitive:
+        tracker_rule_ids = tracker_rule_ids.str.upper()
+        rule_keys = [rule.upper() for rule in rules]
+    tracker_parts = partition_by_rule(tracker, tracker_rule_ids)
+    tracker_parts = [tracker_parts[key] for key in rule_keys]
+    parameters = registry.threshold_parameters(tracker, tracker_rule_ids)
+
+    results = map_rules(
+        rule_function,
+        rules,
+        tracker_parts,
+        [
+            {
+                group: alert_data.alerts(rule, group)
+                for group in tracker_rule["Population Group"].unique()
+            }
+            for rule, tracker_rule in zip(rules, tracker_parts)
+        ],
+        [parameters[tracker_rule.index] for tracker_rule in tracker_parts],
+        workers,
+    )
+
+    # the updates are applied one column at a time rather than cell by cell;
+    # a row updated twice keeps its last value, as when they were applied in
+    # order
+    net_alerts_parts = []
+    column_updates = {}
+    for updates, rule_net_alerts in results:
+        for index, values in updates:
+            for column, value in values.items():
+                column_updates.setdefault(column, ([], []))
+                column_updates[column][0].extend(index)
+                column_updates[column][1].extend([value] * len(index))
+        net_alerts_parts.extend(rule_net_alerts)
+    for column, (labels, values) in column_updates.items():
+        values = pd.Series(values, index=labels)
+        values = values[~values.index.duplicated(keep="last")]
+        tracker.loc[values.index, column] = values.to_numpy()
+
+    return tracker, net_alerts_parts
+
+
+def calculate_net_effectiveness_btl(tracker, sample_data, workers=None, registry=None):
+    tracker, _ = calculate_net_effectiveness(
+        tracker,
+        sample_data,
+        net_effectiveness_btl_rule,
+        workers=workers,
+        registry=registry,
+    )
+    return tracker
 
+
+def calculate_net_effectiveness_atl(tracker, dedupe_data, workers=None, registry=None):
+    tracker, net_alerts_parts = calculate_net_effectiveness(
+        tracker,
+        dedupe_data,
+        net_effectiveness_atl_rule,
+        case_insensitive=True,
+        workers=workers,
+        registry=registry,
+    )
+    net_alerts_final = (
+        pd.concat([part for _, part in net_alerts_parts])
+        if net_alerts_parts
+        else alert_frame(dedupe_data).iloc[0:0]
+    )
     return tracker, net_alerts_final
 
 
@@ -348,6 +778,290 @@ def calculate_final_fields_atl(tracker):
     return tracker
 
 
+def input_file_digest(file_path, cache_dir=None):
+    if cache_dir is None:
+        cache_dir = default_cache_dir(file_path)
+    return cached_file_digest(file_path, cache_dir)
+
+
+def frame_digest(data):
+    # alerts handed over in memory are fingerprinted by content instead
+    return hashlib.sha256(
+        pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes()
+    ).hexdigest()
+
+
+def incremental_state_file(output_file):
+    directory, file_name = os.path.split(output_file)
+    return os.path.join(
+        directory, CACHE_DIR_NAME, os.path.splitext(file_name)[0] + " - state.pkl"
+    )
+
+
+def load_incremental_state(state_file, kind, input_digests):
+    # a state is only reused for the same pipeline over identical alert files
+    if not os.path.exists(state_file):
+        return None
+    state = pd.read_pickle(state_file)
+    if (
+        state.get("version") != INCREMENTAL_STATE_VERSION
+        or state.get("kind") != kind
+        or state.get("input_digests") != input_digests
+    ):
+        return None
+    return state
+
+
+def save_incremental_state(state_file, state):
+    os.makedirs(os.path.dirname(state_file), exist_ok=True)
+    pd.to_pickle(state, state_file + ".tmp")
+    os.replace(state_file + ".tmp", state_file)
+
+
+def tracker_groups(tracker, case_insensitive=False):
+    rule_ids = tracker["Rule ID"]
+    if case_insensitive:
+        rule_ids = rule_ids.str.upper()
+    return list(zip(rule_ids, tracker["Population Group"]))
+
+
+def group_fingerprints(tracker, groups, case_insensitive=False):
+    row_fingerprints = pd.util.hash_pandas_object(
+        tracker.reindex(columns=FINGERPRINT_COLUMNS).astype(str), index=False
+    )
+    fingerprints = {}
+    for group, fingerprint in zip(groups, row_fingerprints):
+        fingerprints[group] = fingerprints.get(group, ()) + (int(fingerprint),)
+
+    if case_insensitive:
+        # every casing of a rule is run against every group of that rule, so
+        # adding or dropping a casing touches all of the rule's groups
+        variants = tracker.groupby(tracker["Rule ID"].str.upper())["Rule ID"].agg(
+            lambda rule_ids: tuple(sorted(rule_ids.unique()))
+        )
+        fingerprints = {
+            group: (fingerprint, variants[group[0]])
+            for group, fingerprint in fingerprints.items()
+        }
+    return fingerprints
+
+
+def changed_groups(fingerprints, state):
+    if state is None:
+        return set(fingerprints)
+    previous = state["fingerprints"]
+    return {
+        group
+        for group, fingerprint in fingerprints.items()
+        if previous.get(group) != fingerprint
+    }
+
+
+def alerts_in_groups(alert_data, rule_ids, groups):
+    alert_groups = pd.MultiIndex.from_arrays(
+        [rule_ids.to_numpy(), alert_data["Population Group"].to_numpy()]
+    )
+    return alert_data[alert_groups.isin(list(groups))]
+
+
+def merge_group_results(tracker, groups, changed, changed_tracker, state, columns):
+    # changed rows take the fresh values, every other group is copied row for
+    # row from the previous run
+    values = np.full((len(tracker), len(columns)), np.nan)
+    positions = [i for i, group in enumerate(groups) if group in changed]
+    values[positions] = changed_tracker[columns].to_numpy(dtype=float)
+
+    group_rows = {}
+    for i, group in enumerate(groups):
+        group_rows.setdefault(group, []).append(i)
+
+    results = {}
+    for group, rows in group_rows.items():
+        if group not in changed:
+            values[rows] = state["results"][group]
+        results[group] = values[rows]
+
+    tracker[columns] = values
+    return tracker, results
+
+
+def net_alert_part_order(tracker):
+    # the (rule, group) order calculate_net_effectiveness_atl emits parts in
+    order = []
+    tracker_rule_ids = tracker["Rule ID"].str.upper()
+    for rule in tracker["Rule ID"].unique():
+        rule_groups = tracker.loc[tracker_rule_ids == rule.upper(), "Population Group"]
+        order.extend((rule, group) for group in rule_groups.unique())
+    return order
+
+
+def update_btl_incrementally(
+    tracker, delta_data, sample_data, state, input_digests, workers=None, registry=None
+):
+    groups = tracker_groups(tracker)
+    fingerprints = group_fingerprints(tracker, groups)
+    changed = changed_groups(fingerprints, state)
+    print(f"Recomputing {len(changed)} of {len(fingerprints)} rule groups")
+
+    delta_counts = (
+        state["delta_counts"] if state is not None else count_delta_alerts(delta_data)
+    )
+    changed_positions = [i for i, group in enumerate(groups) if group in changed]
+    changed_tracker = tracker.iloc[changed_positions].copy()
+    changed_alerts = AlertStore(
+        alerts_in_groups(sample_data, sample_data["Rule ID"], changed)
+    )
+
+    changed_tracker = populate_current_result_info_btl(
+        changed_tracker, None, changed_alerts, delta_counts
+    )
+    changed_tracker = calculate_net_effectiveness_btl(
+        changed_tracker, changed_alerts, workers, registry
+    )
+    tracker, results = merge_group_results(
+        tracker, groups, changed, changed_tracker, state, RESULT_COLUMNS_BTL
+    )
+
+    state = {
+        "version": INCREMENTAL_STATE_VERSION,
+        "kind": "BTL",
+        "input_digests": input_digests,
+        "fingerprints": fingerprints,
+        "results": results,
+        "delta_counts": delta_counts,
+    }
+    return tracker, state
+
+
+def update_atl_incrementally(
+    tracker, dedupe_data, state, input_digests, typed=True, workers=None, registry=None
+):
+    groups = tracker_groups(tracker, case_insensitive=True)
+    fingerprints = group_fingerprints(tracker, groups, case_insensitive=True)
+    changed = changed_groups(fingerprints, state)
+    print(f"Recomputing {len(changed)} of {len(fingerprints)} rule groups")
+
+    changed_positions = [i for i, group in enumerate(groups) if group in changed]
+    changed_tracker = tracker.iloc[changed_positions].copy()
+    changed_alerts = alerts_in_groups(
+        dedupe_data, dedupe_data["Rule ID"].str.upper(), changed
+    )
+    if typed:
+        changed_alerts = type_alerts(changed_alerts, "Changed groups")
+    changed_alerts = AlertStore(changed_alerts, case_insensitive=True)
+
+    changed_tracker = populate_current_result_info_atl(
+        changed_tracker, changed_alerts, registry
+    )
+    changed_tracker, net_alerts_parts = calculate_net_effectiveness(
+        changed_tracker,
+        changed_alerts,
+        net_effectiveness_atl_rule,
+        case_insensitive=True,
+        workers=workers,
+        registry=registry,
+    )
+    tracker, results = merge_group_results(
+        tracker, groups, changed, changed_tracker, state, RESULT_COLUMNS_ATL
+    )
+
+    # net alerts are kept as row labels of the (unchanged) dedupe extract
+    net_alert_labels = {}
+    if state is not None:
+        net_alert_labels = {
+            part: labels
+            for part, labels in state["net_alert_labels"].items()
+            if (part[0].upper(), part[1]) not in changed
+        }
+    for part, net_alerts in net_alerts_parts:
+        net_alert_labels[part] = net_alerts.index.to_numpy()
+
+    labels = [
+        net_alert_labels[part]
+        for part in net_alert_part_order(tracker)
+        if part in net_alert_labels
+    ]
+    net_alerts_final = dedupe_data.loc[
+        np.concatenate(labels) if labels else dedupe_data.index[0:0]
+    ]
+    if typed:
+        net_alerts_final = apply_alert_schema(net_alerts_final)
+
+    state = {
+        "version": INCREMENTAL_STATE_VERSION,
+        "kind": "ATL",
+        "input_digests": input_digests,
+        "fingerprints": fingerprints,
+        "results": results,
+        "net_alert_labels": net_alert_labels,
+    }
+    return tracker, net_alerts_final, state
+
+
+def stream_sheet(workbook, sheet_name, frame):
+    # rows are written strictly in order so xlsxwriter can flush each one;
+    # frames longer than an Excel sheet continue on "<name> (2)", ...
+    rows_per_sheet = MAX_EXCEL_ROWS - 1
+    header = [str(column) for column in frame.columns]
+    sheet_count = max(1, -(-len(frame) // rows_per_sheet))
+
+    for sheet_number in range(sheet_count):
+        name = sheet_name if sheet_number == 0 else f"{sheet_name} ({sheet_number + 1})"
+        worksheet = workbook.add_worksheet(name)
+        worksheet.write_row(0, 0, header)
+
+        sheet_rows = frame.iloc[
+            sheet_number * rows_per_sheet : (sheet_number + 1) * rows_per_sheet
+        ]
+        row_number = 1
+        for start in range(0, len(sheet_rows), STREAM_CHUNK_ROWS):
+            chunk = sheet_rows.iloc[start : start + STREAM_CHUNK_ROWS].astype(object)
+            chunk = chunk.where(chunk.notna(), None)
+            for row in chunk.itertuples(index=False, name=None):
+                worksheet.write_row(row_number, 0, row)
+                row_number += 1
+
+
+def write_tracker(tracker, output_file, extra_sheets=None, constant_memory=False):
+    if not is_excel_file(output_file):
+        # a CSV, Parquet or Arrow output holds one table, so every extra sheet
+        # goes to a side file named after it
+        write_frame(tracker, output_file)
+        stem, extension = os.path.splitext(output_file)
+        for sheet_name, frame in (extra_sheets or {}).items():
+            write_frame(frame, f"{stem} - {sheet_name}{extension}")
+        return
+
+    if constant_memory:
+        options = {
+            "constant_memory": True,
+            "default_date_format": "yyyy-mm-dd hh:mm:ss",
+        }
+        with pd.ExcelWriter(
+            output_file, engine="xlsxwriter", engine_kwargs={"options": options}
+        ) as writer:
+            stream_sheet(writer.book, "Sheet1", tracker)
+            for sheet_name, frame in (extra_sheets or {}).items():
+                stream_sheet(writer.book, sheet_name, frame)
+        return
+
+    if not extra_sheets:
+        tracker.to_excel(output_file, index=False)
+        return
+
+    with pd.ExcelWriter(output_file) as writer:
+        tracker.to_excel(writer, sheet_name="Sheet1", index=False)
+        for sheet_name, frame in extra_sheets.items():
+            frame.to_excel(writer, sheet_name=sheet_name, index=False)
+
+
+def write_net_alerts(net_alerts, output_file, output_format):
+    if output_format not in ("csv", "parquet", "feather"):
+        raise ValueError(f"Unknown net alerts output format: {output_format}")
+    side_file = os.path.splitext(output_file)[0] + " - Net Alerts"
+    write_frame(net_alerts, f"{side_file}.{output_format}")
+
+
 def process_btl_tuning_tracker(
     tracker_file_path,
     tracker_file_name,
@@ -357,38 +1071,179 @@ def process_btl_tuning_tracker(
     sample_file_name,
     output_file_path,
     output_file_name,
+    threshold_sweep=False,
+    sweep_thresholds=None,
+    confidence_intervals=False,
+    workers=None,
+    constant_memory=False,
+    chunk_rows=None,
+    typed=True,
+    run_report=None,
+    profile_dir=None,
+    incremental=False,
+    rule_config=None,
+    cache_dir=None,
+    delta_data=None,
 ):
-    tracker = read_excel(tracker_file_path + tracker_file_name, sheet_name=0)
-    tracker = filter_tracker(tracker, "Yes")
-
-    delta_data = read_excel(delta_file_path + delta_file_name, sheet_name=1)
-    sample_data = read_excel(sample_file_path + sample_file_name, sheet_name=0)
+    # delta_data takes delta alerts already in memory (e.g. straight from
+    # dedupe_alerts) instead of reading them from the delta workbook
+    report = new_run_report("BTL", profile_dir)
+    registry = load_rule_registry(rule_config)
+    tracker = run_stage(
+        report,
+        "read tracker",
+        read_table,
+        tracker_file_path + tracker_file_name,
+        sheet_name=0,
+        cache_dir=cache_dir,
+        filters={"Is Tunable": ["Yes"]},
+    )
+    tracker = run_stage(report, "filter_tracker", filter_tracker, tracker, "Yes")
+
+    state = None
+    if incremental:
+        # a different rule config can change every group's results
+        input_digests = [
+            (
+                frame_digest(delta_data)
+                if delta_data is not None
+                else input_file_digest(delta_file_path + delta_file_name, cache_dir)
+            ),
+            input_file_digest(sample_file_path + sample_file_name, cache_dir),
+            registry.digest(),
+        ]
+        state_file = incremental_state_file(output_file_path + output_file_name)
+        state = load_incremental_state(state_file, "BTL", input_digests)
+
+    # the delta extract is only counted by group, and only for the tracker's
+    # rules; an incremental run counts every rule so its saved counts cover
+    # rules added later. the sample is never filtered by rule, as its date
+    # range spans every rule
+    rule_filter = None
+    if not incremental:
+        rule_filter = {"Rule ID": tracker["Rule ID"].dropna().unique()}
+
+    # streamed delta chunks are read inside populate_current_result_info_btl,
+    # and an incremental run reuses the delta counts from its saved state
+    delta_streamed = bool(chunk_rows) and delta_data is None and state is None
+    if state is not None:
+        delta_data = None
+    elif delta_streamed:
+        delta_data = iter_alert_chunks(
+            delta_file_path + delta_file_name,
+            sheet_name=1,
+            chunk_rows=chunk_rows,
+            columns=GROUP_KEYS,
+            filters=rule_filter,
+        )
+    elif delta_data is None:
+        delta_data = run_stage(
+            report,
+            "read delta alerts",
+            read_table,
+            delta_file_path + delta_file_name,
+            sheet_name=1,
+            cache_dir=cache_dir,
+            columns=GROUP_KEYS,
+            filters=rule_filter,
+        )
+    sample_data = run_stage(
+        report,
+        "read sample alerts",
+        read_table,
+        sample_file_path + sample_file_name,
+        sheet_name=0,
+        cache_dir=cache_dir,
+        columns=pipeline_column,
+    )
+    if typed:
+        if not delta_streamed and delta_data is not None:
+            delta_data = run_stage(
+                report, "type delta alerts", type_alerts, delta_data, "Delta data"
+            )
+        sample_data = run_stage(
+            report, "type sample alerts", type_alerts, sample_data, "Sample data"
+        )
     sample_data["Alert Date"] = pd.to_datetime(sample_data["Alert Date"])
 
     tracker["Date Range"] = calculate_date_range(sample_data, "Alert Date")
 
-    columns_to_add_btl = [
-        "Num Alerts Extracted",
-        "Num Alerts Sampled",
-        "Interesting Alerts",
-        "Not Interesting Alerts",
-        "Data Quality Alerts",
-        "Effectiveness",
-        "Prop Interesting Alerts",
-        "Prop Not Interesting Alerts",
-        "Prop Effectiveness",
-        "Net Effectiveness",
-        "Min Val",
-        "Max Val",
-    ]
-    tracker = create_empty_columns(tracker, columns_to_add_btl)
+    tracker = create_empty_columns(tracker, COLUMNS_TO_ADD_BTL)
+
+    if incremental:
+        tracker, state = run_stage(
+            report,
+            "update_btl_incrementally",
+            update_btl_incrementally,
+            tracker,
+            delta_data,
+            sample_data,
+            state,
+            input_digests,
+            workers,
+            registry,
+        )
+        save_incremental_state(state_file, state)
+    else:
+        sample_store = run_stage(report, "index sample alerts", AlertStore, sample_data)
+        tracker = run_stage(
+            report,
+            "populate_current_result_info_btl",
+            populate_current_result_info_btl,
+            tracker,
+            delta_data,
+            sample_store,
+        )
+        tracker = run_stage(
+            report,
+            "calculate_net_effectiveness_btl",
+            calculate_net_effectiveness_btl,
+            tracker,
+            sample_store,
+            workers,
+            registry,
+        )
+    tracker = run_stage(
+        report, "calculate_final_fields_btl", calculate_final_fields_btl, tracker
+    )
 
-    tracker = populate_current_result_info_btl(tracker, delta_data, sample_data)
-    tracker = calculate_net_effectiveness_btl(tracker, sample_data)
-    tracker = calculate_final_fields_btl(tracker)
+    extra_sheets = {}
+    if threshold_sweep:
+        extra_sheets["Threshold Sweep"] = run_stage(
+            report,
+            "sweep_thresholds_btl",
+            sweep_thresholds_btl,
+            tracker,
+            sample_data,
+            sweep_thresholds,
+        )
+    if confidence_intervals:
+        # imported here as the intervals are built on backtest.py, which
+        # imports this module
+        from confidence import confidence_intervals_btl
+
+        extra_sheets["Confidence Intervals"] = run_stage(
+            report,
+            "confidence_intervals_btl",
+            confidence_intervals_btl,
+            tracker,
+            sample_data,
+            registry,
+        )
 
     tracker.fillna(0, inplace=True)
-    tracker.to_excel(output_file_path + output_file_name, index=False)
+    run_stage(
+        report,
+        "write_tracker",
+        write_tracker,
+        tracker,
+        output_file_path + output_file_name,
+        extra_sheets,
+        constant_memory,
+    )
+
+    if run_report is not None:
+        write_run_report(report, run_report)
 
 
 def process_atl_tuning_tracker(
@@ -398,45 +1253,187 @@ def process_atl_tuning_tracker(
     dedupe_file_name,
     output_file_path,
     output_file_name,
+    threshold_sweep=False,
+    sweep_thresholds=None,
+    confidence_intervals=False,
+    workers=None,
+    constant_memory=False,
+    net_alerts_output=None,
+    chunk_rows=None,
+    typed=True,
+    run_report=None,
+    profile_dir=None,
+    incremental=False,
+    rule_config=None,
+    cache_dir=None,
+    dedupe_data=None,
 ):
-    tracker = read_excel(tracker_file_path + tracker_file_name, sheet_name=0)
-    tracker = filter_tracker(tracker, "Yes")
-
-    dedupe_data = read_excel(dedupe_file_path + dedupe_file_name, sheet_name=0)
-
-    columns_to_add_atl = [
-        "Num Alerts Extracted",
-        "SARs Filed",
-        "Interesting Alerts",
-        "Not Interesting Alerts",
-        "Data Quality Alerts",
-        "Effectiveness",
-        "SAR Yield",
-        "Prop SARs Filed",
-        "Prop Interesting Alerts",
-        "Prop Not Interesting Alerts",
-        "Prop Effectiveness",
-        "Prop SAR Yield",
-        "Not Interesting Alert Reduction",
-        "Net Effectiveness",
-        "Net SAR Yield",
-        "Net Not Interesting Alert Reduction",
-        "Min Val",
-        "Max Val",
-        "Alert Count",
-        "Proposed Alert Count",
-        "Proposed Alert Reduction",
-    ]
-    tracker = create_empty_columns(tracker, columns_to_add_atl)
+    # dedupe_data takes deduped alerts already in memory (e.g. straight from
+    # dedupe_alerts) instead of reading them from the dedupe workbook
+    report = new_run_report("ATL", profile_dir)
+    registry = load_rule_registry(rule_config)
+    tracker = run_stage(
+        report,
+        "read tracker",
+        read_table,
+        tracker_file_path + tracker_file_name,
+        sheet_name=0,
+        cache_dir=cache_dir,
+        filters={"Is Tunable": ["Yes"]},
+    )
+    tracker = run_stage(report, "filter_tracker", filter_tracker, tracker, "Yes")
+
+    if incremental:
+        input_digests = [
+            (
+                frame_digest(dedupe_data)
+                if dedupe_data is not None
+                else input_file_digest(dedupe_file_path + dedupe_file_name, cache_dir)
+            ),
+            registry.digest(),
+        ]
+        state_file = incremental_state_file(output_file_path + output_file_name)
+        state = load_incremental_state(state_file, "ATL", input_digests)
+
+    # only alerts of the tracker's rules (in any casing) are read; an
+    # incremental run keeps every alert so its saved net alert row labels
+    # stay valid
+    rule_filter = None
+    if not incremental:
+        rule_filter = {"Rule ID": tracker["Rule ID"].dropna().unique()}
+
+    # net effectiveness needs every alert of a group at once, so the streamed
+    # extract is only projected to the pipeline columns, not kept in chunks
+    if dedupe_data is None and chunk_rows:
+        dedupe_data = run_stage(
+            report,
+            "read dedupe alerts",
+            read_alerts,
+            dedupe_file_path + dedupe_file_name,
+            sheet_name=0,
+            chunk_rows=chunk_rows,
+            filters=rule_filter,
+            case_insensitive=["Rule ID"],
+        )
+    elif dedupe_data is None:
+        dedupe_data = run_stage(
+            report,
+            "read dedupe alerts",
+            read_table,
+            dedupe_file_path + dedupe_file_name,
+            sheet_name=0,
+            cache_dir=cache_dir,
+            filters=rule_filter,
+            case_insensitive=["Rule ID"],
+        )
+    # an incremental run only types the alerts of the groups it recomputes
+    if typed and not incremental:
+        dedupe_data = run_stage(
+            report, "type dedupe alerts", type_alerts, dedupe_data, "Dedupe data"
+        )
+
+    tracker = create_empty_columns(tracker, COLUMNS_TO_ADD_ATL)
+
+    if incremental:
+        tracker, net_alerts_final, state = run_stage(
+            report,
+            "update_atl_incrementally",
+            update_atl_incrementally,
+            tracker,
+            dedupe_data,
+            state,
+            input_digests,
+            typed,
+            workers,
+            registry,
+        )
+        save_incremental_state(state_file, state)
+    else:
+        dedupe_store = run_stage(
+            report,
+            "index dedupe alerts",
+            AlertStore,
+            dedupe_data,
+            case_insensitive=True,
+        )
+        tracker = run_stage(
+            report,
+            "populate_current_result_info_atl",
+            populate_current_result_info_atl,
+            tracker,
+            dedupe_store,
+            registry,
+        )
+        tracker, net_alerts_final = run_stage(
+            report,
+            "calculate_net_effectiveness_atl",
+            calculate_net_effectiveness_atl,
+            tracker,
+            dedupe_store,
+            workers,
+            registry,
+        )
+    tracker = run_stage(
+        report, "calculate_final_fields_atl", calculate_final_fields_atl, tracker
+    )
+
+    extra_sheets = {}
+    if threshold_sweep:
+        extra_sheets["Threshold Sweep"] = run_stage(
+            report,
+            "sweep_thresholds_atl",
+            sweep_thresholds_atl,
+            tracker,
+            dedupe_data,
+            sweep_thresholds,
+            registry=registry,
+        )
+    if confidence_intervals:
+        # imported here as the intervals are built on backtest.py, which
+        # imports this module
+        from confidence import confidence_intervals_atl
+
+        extra_sheets["Confidence Intervals"] = run_stage(
+            report,
+            "confidence_intervals_atl",
+            confidence_intervals_atl,
+            tracker,
+            dedupe_data,
+            registry,
+        )
 
-    tracker = populate_current_result_info_atl(tracker, dedupe_data)
-    tracker, net_alerts_final = calculate_net_effectiveness_atl(tracker, dedupe_data)
-    tracker = calculate_final_fields_atl(tracker)
+    # the retained net alerts can reach millions of rows, so as a sheet they
+    # are always streamed through the constant-memory writer
+    if net_alerts_output == "xlsx":
+        extra_sheets["Net Alerts"] = net_alerts_final
+        constant_memory = True
+    elif net_alerts_output is not None:
+        run_stage(
+            report,
+            "write_net_alerts",
+            write_net_alerts,
+            net_alerts_final,
+            output_file_path + output_file_name,
+            net_alerts_output,
+        )
 
     tracker.fillna(0, inplace=True)
-    tracker.to_excel(output_file_path + output_file_name, index=False)
+    run_stage(
+        report,
+        "write_tracker",
+        write_tracker,
+        tracker,
+        output_file_path + output_file_name,
+        extra_sheets,
+        constant_memory,
+    )
+
+    net_alert_ids = net_alerts_final["Alert ID"].nunique()
+    print(net_alert_ids)
 
-    print(net_alerts_final["Alert ID"].nunique())
+    if run_report is not None:
+        report["net_alert_ids"] = net_alert_ids
+        write_run_report(report, run_report)
 
 
 if __name__ == "__main__":
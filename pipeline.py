@@ -0,0 +1,185 @@
+import os
+
+import pandas as pd
+
+from alert_store import AlertStore
+from dedupe import dedupe_alert_chunks, dedupe_alerts
+from ingest import apply_alert_schema, iter_alert_chunks, read_alerts
+from merged_tuning_tracker import (
+    COLUMNS_TO_ADD_ATL,
+    COLUMNS_TO_ADD_BTL,
+    calculate_date_range,
+    calculate_final_fields_atl,
+    calculate_final_fields_btl,
+    calculate_net_effectiveness_atl,
+    calculate_net_effectiveness_btl,
+    count_delta_alerts,
+    create_empty_columns,
+    filter_tracker,
+    populate_current_result_info_atl,
+    populate_current_result_info_btl,
+    read_table,
+    write_tracker,
+)
+from rule_registry import load_rule_registry
+from sampling import SAMPLE_SEED, sample_alerts
+
+DECISION_COLUMNS = ["Alert ID", "Tuning Decision"]
+# what a later run needs once the sample comes back decisioned
+HANDOFF_TABLES = ["deduped", "sample"]
+
+
+class TuningPipeline:
+    # dedupe -> sample -> decision join -> tracker on tables held in memory;
+    # the deduped alerts are typed once and every later stage shares them.
+    # only the hand-off to human decisioning is checkpointed, as Parquet, so
+    # the decisioned sample can be joined back in a later process
+    def __init__(
+        self,
+        checkpoint_dir=None,
+        rule_config=None,
+        workers=None,
+        seed=SAMPLE_SEED,
+        pop_groups_exist=True,
+    ):
+        self.checkpoint_dir = checkpoint_dir
+        self.registry = load_rule_registry(rule_config)
+        self.workers = workers
+        self.seed = seed
+        self.pop_groups_exist = pop_groups_exist
+        self.tables = {}
+
+    def checkpoint_file(self, name):
+        return os.path.join(self.checkpoint_dir, f"{name}.parquet")
+
+    def checkpoint(self, names):
+        if self.checkpoint_dir is None:
+            return
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        for name in names:
+            self.tables[name].to_parquet(self.checkpoint_file(name))
+
+    def table(self, name):
+        if name not in self.tables:
+            if self.checkpoint_dir is None or not os.path.exists(
+                self.checkpoint_file(name)
+            ):
+                raise ValueError(f"No {name} alerts: run the stage that makes them")
+            self.tables[name] = pd.read_parquet(self.checkpoint_file(name))
+        return self.tables[name]
+
+    def dedupe(self, raw_alerts, sheet_name=0):
+        # a file is read untyped in chunks, as dedupe.py does
+        if isinstance(raw_alerts, pd.DataFrame):
+            deduped = dedupe_alerts(raw_alerts, self.registry)
+        else:
+            deduped = dedupe_alert_chunks(
+                iter_alert_chunks(
+                    raw_alerts, sheet_name=sheet_name, columns=None, dtype=None
+                ),
+                self.registry,
+            )
+        self.tables["deduped"] = apply_alert_schema(deduped)
+        return self.tables["deduped"]
+
+    def sample(self):
+        full_sample, qc, allocation = sample_alerts(
+            self.table("deduped"),
+            self.pop_groups_exist,
+            self.seed,
+            self.workers,
+            self.registry,
+        )
+        self.tables.update(sample=full_sample, qc=qc, allocation=allocation)
+        self.checkpoint(HANDOFF_TABLES)
+        return full_sample
+
+    def join_decisions(self, decisions, sheet_name=0):
+        # one decision per alert, joined onto every sampled record of it
+        if not isinstance(decisions, pd.DataFrame):
+            decisions = read_alerts(
+                decisions, sheet_name=sheet_name, columns=DECISION_COLUMNS
+            )
+        decisions = decisions[DECISION_COLUMNS].dropna(subset=["Alert ID"])
+        decisions = decisions.drop_duplicates(subset="Alert ID", keep="last")
+        alert_decisions = pd.Series(
+            decisions["Tuning Decision"].to_numpy(),
+            index=decisions["Alert ID"].astype(str),
+        )
+
+        sample = self.table("sample")
+        joined = sample.assign(
+            **{
+                "Tuning Decision": sample["Alert ID"]
+                .astype(str)
+                .map(alert_decisions)
+                .astype("category")
+            }
+        )
+
+        undecided = joined["Tuning Decision"].isna().sum()
+        if undecided:
+            print(f"{undecided} sampled alerts have no decision")
+        self.tables["decisioned"] = joined
+        return joined
+
+    def read_tracker(self, tracker):
+        if not isinstance(tracker, pd.DataFrame):
+            tracker = read_table(tracker, filters={"Is Tunable": ["Yes"]})
+        return filter_tracker(tracker, "Yes")
+
+    def run_atl(self, tracker):
+        tracker = create_empty_columns(self.read_tracker(tracker), COLUMNS_TO_ADD_ATL)
+        dedupe_store = AlertStore(self.table("deduped"), case_insensitive=True)
+
+        tracker = populate_current_result_info_atl(tracker, dedupe_store, self.registry)
+        tracker, net_alerts = calculate_net_effectiveness_atl(
+            tracker, dedupe_store, self.workers, self.registry
+        )
+        tracker = calculate_final_fields_atl(tracker)
+        tracker.fillna(0, inplace=True)
+        self.tables.update(atl_tracker=tracker, net_alerts=net_alerts)
+        return tracker
+
+    def run_btl(self, tracker):
+        # the deduped alerts are the delta population the sample was drawn from
+        tracker = self.read_tracker(tracker)
+        sample_data = self.table("decisioned")
+        tracker["Date Range"] = calculate_date_range(sample_data, "Alert Date")
+        tracker = create_empty_columns(tracker, COLUMNS_TO_ADD_BTL)
+        sample_store = AlertStore(sample_data)
+
+        tracker = populate_current_result_info_btl(
+            tracker, None, sample_store, count_delta_alerts(self.table("deduped"))
+        )
+        tracker = calculate_net_effectiveness_btl(
+            tracker, sample_store, self.workers, self.registry
+        )
+        tracker = calculate_final_fields_btl(tracker)
+        tracker.fillna(0, inplace=True)
+        self.tables["btl_tracker"] = tracker
+        return tracker
+
+
+if __name__ == "__main__":
+    fp = "C:/Users/kadam/Documents/TM_Tuning_Codebase_Consolidation/Initial Data/"
+    ufp = "C:/Users/kadam/Documents/TM_Tuning_Codebase_Consolidation/New Data/"
+
+    # first run: dedupe and sample, then hand the sample out for decisioning
+    pipeline = TuningPipeline(checkpoint_dir=ufp + "Checkpoints/")
+    pipeline.dedupe(fp + "Actimize_Alerts_2022-05-31_to_2023-05-31 FINAL.xlsx")
+    pipeline.sample().to_excel(ufp + "Python Sample.xlsx", index=False)
+
+    # later run: join the decisions back and fill in the trackers
+    pipeline = TuningPipeline(checkpoint_dir=ufp + "Checkpoints/")
+    pipeline.join_decisions(ufp + "Python Sample - Decisioned.xlsx")
+    write_tracker(
+        pipeline.run_btl(
+            fp + "SAM Tuning - Proposed BTL High Priority Thresholds.xlsx"
+        ),
+        ufp + "Production BTL Tuning Tracker - With Calculations.xlsx",
+    )
+    write_tracker(
+        pipeline.run_atl(fp + "Proposed ATL High Priority Thresholds.xlsx"),
+        ufp + "Actimize Tuning Tracker - ATL Calculations.xlsx",
+    )
@@ -0,0 +1,172 @@
+import hashlib
+import json
+import os
+import re
+
+import pandas as pd
+
+RULE_FIELDS = ["stratify", "threshold_parameter", "dedupe"]
+DEDUPE_POLICIES = ["latest", "earliest"]
+# a threshold parameter of "Parameter Type" takes the tracker row's own column
+TRACKER_PARAMETER = "Parameter Type"
+# change log v1 evaluated the ATL Prop counts and every net effectiveness on
+# this column whatever the row's Parameter Type. it is only used when asked
+# for, with legacy_threshold_parameter=True or "legacy_threshold_parameter":
+# true at the top of a JSON/YAML rule config, to reproduce earlier outputs
+LEGACY_THRESHOLD_PARAMETER = "Occurrence_Parameter"
+LEGACY_RULE = {"pattern": ".*", "threshold_parameter": LEGACY_THRESHOLD_PARAMETER}
+EXCEL_COLUMNS = {
+    "Rule ID Pattern": "pattern",
+    "Stratify Parameters": "stratify",
+    "Threshold Parameter": "threshold_parameter",
+    "Dedupe Policy": "dedupe",
+}
+
+# patterns are regular expressions matched against the whole Rule ID; each
+# field of a rule comes from the first entry that matches it and sets the
+# field, so a config only needs the entries that differ from these
+DEFAULT_RULES = [
+    {
+        "pattern": "AML-EBB-IFT-ALL-A-D30-EOP|AML-EBO-IFT-ALL-P-D05-EOP"
+        "|AML-EBA-IFT-ALL-A-D07-ERL|AML-EBA-IFT-ALL-P-D01-ERL"
+        "|AML-EBB-IFT-ALL-P-D05-EOP",
+        "stratify": ["Value_Parameter", "Volume_Parameter"],
+    },
+    {
+        "pattern": "AML-HBC-CCE-INN-A-M01-HBN|AML-HBC-CCE-INN-A-M01-HBS",
+        "stratify": ["STDEV_Parameter", "Volume_Parameter"],
+    },
+    {
+        "pattern": "AML-FTF-AWR-CSH-A-D05-FTR|AML-FTF-CSH-AWR-A-D07-FTR"
+        "|AML-FTF-CSH-CSH-A-D07-FTR",
+        "stratify": ["Ratio_Parameter", "Value_Parameter"],
+    },
+    # HBC rules and monthly (M01/M03) rules keep the latest record per
+    # alert/account, every other rule keeps the earliest record per transaction
+    {
+        "pattern": "[^-]*-HBC(-.*)?|[^-]*-[^-]*-HBC(-.*)?|([^-]*-){5}M0[13](-.*)?",
+        "dedupe": "latest",
+    },
+    # every row's threshold is evaluated on its own Parameter Type
+    {
+        "pattern": ".*",
+        "stratify": ["Value_Parameter", "Occurrence_Parameter"],
+        "threshold_parameter": TRACKER_PARAMETER,
+        "dedupe": "earliest",
+    },
+]
+
+
+def excel_rules(file_path):
+    rows = pd.read_excel(file_path, sheet_name=0, dtype=str)
+    rows = rows.rename(columns=lambda column: EXCEL_COLUMNS.get(column.strip()))
+    rules = []
+    for row in rows.to_dict("records"):
+        rule = {
+            field: value.strip()
+            for field, value in row.items()
+            if field is not None and isinstance(value, str) and value.strip()
+        }
+        if "stratify" in rule:
+            rule["stratify"] = [param.strip() for param in rule["stratify"].split(",")]
+        rules.append(rule)
+    return rules
+
+
+def read_rule_config(file_path):
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == ".json":
+        with open(file_path) as handle:
+            config = json.load(handle)
+    elif extension in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError("Reading a YAML rule config requires PyYAML")
+        with open(file_path) as handle:
+            config = yaml.safe_load(handle)
+    elif extension in (".xlsx", ".xls"):
+        config = excel_rules(file_path)
+    else:
+        raise ValueError(f"Unknown rule config format: {extension}")
+
+    if isinstance(config, dict):
+        rules = list(config.get("rules", []))
+        if config.get("legacy_threshold_parameter"):
+            rules.append(LEGACY_RULE)
+        return rules
+    return config
+
+
+def compile_rule(rule):
+    unknown = set(rule) - set(RULE_FIELDS) - {"pattern"}
+    if unknown:
+        raise ValueError(f"Unknown rule config fields: {sorted(unknown)}")
+    if "pattern" not in rule:
+        raise ValueError(f"Rule config entry has no pattern: {rule}")
+    if "dedupe" in rule and rule["dedupe"] not in DEDUPE_POLICIES:
+        raise ValueError(f"Unknown dedupe policy: {rule['dedupe']}")
+
+    compiled = dict(rule, pattern=re.compile(rule["pattern"]))
+    if "stratify" in compiled:
+        compiled["stratify"] = tuple(compiled["stratify"])
+    return compiled
+
+
+class RuleRegistry:
+    # every Rule ID is matched against the patterns once; stages look up the
+    # resolved fields for all of their rules as one table
+    def __init__(self, rules):
+        self.rules = [compile_rule(rule) for rule in rules]
+        self.resolved = {}
+
+    def resolve(self, rule_id):
+        if rule_id not in self.resolved:
+            fields = {}
+            for rule in self.rules:
+                if rule["pattern"].fullmatch(str(rule_id)):
+                    for field in RULE_FIELDS:
+                        if field in rule and field not in fields:
+                            fields[field] = rule[field]
+            missing = [field for field in RULE_FIELDS if field not in fields]
+            if missing:
+                raise ValueError(f"No rule config sets {missing} for {rule_id}")
+            self.resolved[rule_id] = fields
+        return self.resolved[rule_id]
+
+    def lookup(self, rule_ids):
+        rule_ids = pd.unique(pd.Series(rule_ids).dropna())
+        return pd.DataFrame(
+            [self.resolve(rule_id) for rule_id in rule_ids],
+            index=pd.Index(rule_ids, name="Rule ID"),
+            columns=RULE_FIELDS,
+        )
+
+    def stratify_params(self, rule_id):
+        return list(self.resolve(rule_id)["stratify"])
+
+    def keeps_latest_record(self, rule_ids):
+        policies = self.lookup(rule_ids)["dedupe"]
+        return (pd.Series(rule_ids).map(policies) == "latest").to_numpy()
+
+    def threshold_parameters(self, tracker, rule_ids=None):
+        # the alert column each tracker row's threshold is evaluated on
+        if rule_ids is None:
+            rule_ids = tracker["Rule ID"]
+        parameters = rule_ids.map(self.lookup(rule_ids)["threshold_parameter"])
+        from_tracker = (parameters == TRACKER_PARAMETER).to_numpy()
+        if from_tracker.any():
+            parameters = parameters.where(~from_tracker, tracker[TRACKER_PARAMETER])
+        return parameters
+
+    def digest(self):
+        rules = [dict(rule, pattern=rule["pattern"].pattern) for rule in self.rules]
+        return hashlib.sha256(json.dumps(rules, sort_keys=True).encode()).hexdigest()
+
+
+def load_rule_registry(file_path=None, legacy_threshold_parameter=False):
+    # entries from the config are tried before the defaults
+    rules = read_rule_config(file_path) if file_path else []
+    if legacy_threshold_parameter:
+        rules = rules + [LEGACY_RULE]
+    return RuleRegistry(rules + DEFAULT_RULES)
@@ -0,0 +1,107 @@
+import cProfile
+import json
+import os
+import pstats
+import sys
+import time
+
+import pandas as pd
+
+PROFILE_TOP_FUNCTIONS = 15
+
+
+def peak_rss_mb():
+    # high-water mark of the whole process, so a stage that raises it is the
+    # one whose value jumps in the report
+    try:
+        import resource
+    except ImportError:
+        resource = None
+
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # bytes on macOS, kilobytes on Linux
+        return round(peak / 1e6 if sys.platform == "darwin" else peak / 1024, 1)
+
+    try:
+        import psutil
+    except ImportError:
+        return None
+    info = psutil.Process().memory_info()
+    return round(getattr(info, "peak_wset", info.rss) / 1e6, 1)
+
+
+def result_rows(result):
+    if isinstance(result, tuple) and result:
+        result = result[0]
+    if isinstance(result, pd.DataFrame):
+        return len(result)
+    return None
+
+
+def new_run_report(name, profile_dir=None):
+    return {
+        "name": name,
+        "started": pd.Timestamp.now().isoformat(timespec="seconds"),
+        "profile_dir": profile_dir,
+        "stages": [],
+    }
+
+
+def top_functions(profiler):
+    stats = pstats.Stats(profiler).sort_stats("cumulative")
+    rows = []
+    for function in stats.fcn_list[:PROFILE_TOP_FUNCTIONS]:
+        calls, _, own_time, cumulative_time, _ = stats.stats[function]
+        file_name, line, function_name = function
+        rows.append(
+            {
+                "function": f"{os.path.basename(file_name)}:{line}({function_name})",
+                "calls": calls,
+                "own_seconds": round(own_time, 4),
+                "cumulative_seconds": round(cumulative_time, 4),
+            }
+        )
+    return rows
+
+
+def run_stage(report, stage, function, *args, **kwargs):
+    profiler = cProfile.Profile() if report["profile_dir"] else None
+    wall_start = time.perf_counter()
+    cpu_start = time.process_time()
+
+    if profiler is not None:
+        result = profiler.runcall(function, *args, **kwargs)
+    else:
+        result = function(*args, **kwargs)
+
+    record = {
+        "stage": stage,
+        "wall_seconds": round(time.perf_counter() - wall_start, 4),
+        "cpu_seconds": round(time.process_time() - cpu_start, 4),
+        "peak_rss_mb": peak_rss_mb(),
+        "rows": result_rows(result),
+    }
+
+    if profiler is not None:
+        os.makedirs(report["profile_dir"], exist_ok=True)
+        profile_file = os.path.join(
+            report["profile_dir"], f"{report['name']} - {stage}.prof"
+        )
+        profiler.dump_stats(profile_file)
+        record["profile_file"] = profile_file
+        record["top_functions"] = top_functions(profiler)
+
+    report["stages"].append(record)
+    return result
+
+
+def write_run_report(report, file_path):
+    report["total_wall_seconds"] = round(
+        sum(stage["wall_seconds"] for stage in report["stages"]), 4
+    )
+    report["total_cpu_seconds"] = round(
+        sum(stage["cpu_seconds"] for stage in report["stages"]), 4
+    )
+    with open(file_path, "w") as handle:
+        json.dump(report, handle, indent=2, default=str)
@@ -0,0 +1,269 @@
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from rule_registry import load_rule_registry
+
+CONFIDENCE_LEVEL = 0.95
+Z_VALUE = 1.96
+SUCCESS_PROBABILITY = 0.5
+CONFIDENCE_INTERVAL = 0.05
+MIN_SAMPLE_SIZE = 100
+BASE_SAMPLE_SIZE = (
+    Z_VALUE
+    * Z_VALUE
+    * SUCCESS_PROBABILITY
+    * (1 - SUCCESS_PROBABILITY)
+    / CONFIDENCE_INTERVAL
+    / CONFIDENCE_INTERVAL
+)
+
+PARAMS = [
+    "STDEV_Parameter",
+    "Ratio_Parameter",
+    "Value_Parameter",
+    "Occurrence_Parameter",
+    "Volume_Parameter",
+]
+
+# fixed so a rerun on the same extract draws the same sample
+SAMPLE_SEED = 20230601
+
+
+def new_sample_sizes(population):
+    # finite population correction of the base sample size, never below the
+    # minimum
+    return np.maximum(
+        np.ceil(BASE_SAMPLE_SIZE / (1 + (BASE_SAMPLE_SIZE - 1) / population)),
+        MIN_SAMPLE_SIZE,
+    )
+
+
+def stratum_sample_sizes(stratum_count, sample_size, population):
+    proportional = stratum_count * sample_size / population
+    return np.where(
+        stratum_count < 6,
+        stratum_count,
+        np.where(proportional < 6, 5, np.ceil(proportional)),
+    )
+
+
+def sampling_frames(data_to_sample, keys):
+    # one row per rule (and population group) in the order they are sampled:
+    # largest rule first, then its largest group, ties in order of appearance
+    grouped = data_to_sample.groupby(keys, sort=False, observed=True)
+    frame_ids = grouped.ngroup().to_numpy()
+    frames = grouped.size().rename("Population").reset_index()
+
+    rule_codes = pd.factorize(frames["Rule ID"])[0]
+    rule_population = frames.groupby("Rule ID", sort=False, observed=True)[
+        "Population"
+    ].transform("sum")
+    order = np.lexsort(
+        (
+            np.arange(len(frames)),
+            -frames["Population"].to_numpy(),
+            rule_codes,
+            -rule_population.to_numpy(),
+        )
+    )
+    frames = frames.iloc[order].reset_index(drop=True)
+
+    # rows without a rule or group have frame id -1, which picks the trailing
+    # -1 so they are never sampled
+    positions = np.full(len(order) + 1, -1, dtype=np.int64)
+    positions[order] = np.arange(len(order))
+    row_frames = positions[frame_ids]
+    return frames, row_frames
+
+
+def strata_codes(data_to_sample, frames, row_frames, registry):
+    # one decimal digit per parameter. the strict percentile of an alert in
+    # its frame is the number of smaller values, i.e. its "min" rank - 1, so
+    # every frame is stratified in one grouped pass per parameter
+    population = frames["Population"].to_numpy()
+    stratified = np.zeros(len(row_frames), dtype=bool)
+    valid = row_frames >= 0
+    stratified[valid] = population[row_frames[valid]] > MIN_SAMPLE_SIZE
+
+    codes = np.full(len(row_frames), -1, dtype=np.int64)
+    # rules stratified on the same parameters are coded together
+    rules_by_params = {}
+    for rule_id, params in registry.lookup(frames["Rule ID"])["stratify"].items():
+        rules_by_params.setdefault(params, []).append(rule_id)
+
+    for params, rule_ids in rules_by_params.items():
+        rows = stratified & data_to_sample["Rule ID"].isin(rule_ids).to_numpy()
+        if not rows.any():
+            continue
+        rows_frames = row_frames[rows]
+        rows_codes = np.zeros(rows.sum(), dtype=np.int64)
+        for param in params:
+            values = data_to_sample.loc[rows, param].astype(float)
+            if values.isna().any():
+                raise ValueError("Cannot stratify on a parameter with missing values")
+            smaller = values.groupby(rows_frames).rank(method="min").to_numpy() - 1
+            percentiles = smaller * (100.0 / population[rows_frames])
+            deciles = np.minimum(9, 0.1 * np.floor(percentiles)).astype(np.int64)
+            rows_codes = rows_codes * 10 + deciles
+        codes[rows] = rows_codes
+    return codes
+
+
+def allocation_table(data_to_sample, pop_groups_exist=True, registry=None):
+    # every stratum that will be drawn, with its sample size; frames of at most
+    # MIN_SAMPLE_SIZE alerts are taken whole as a single "NA" stratum.
+    # also returns the allocation row of every alert (-1 when not sampled)
+    if registry is None:
+        registry = load_rule_registry()
+    keys = ["Rule ID", "Population Group"] if pop_groups_exist else ["Rule ID"]
+    frames, row_frames = sampling_frames(data_to_sample, keys)
+    codes = strata_codes(data_to_sample, frames, row_frames, registry)
+
+    valid = row_frames >= 0
+    strata = (
+        pd.DataFrame({"frame": row_frames[valid], "code": codes[valid]})
+        .groupby(["frame", "code"])
+        .size()
+        .rename("Stratum Population")
+        .reset_index()
+    )
+    # within a frame the largest stratum is drawn first
+    strata = strata.iloc[
+        np.lexsort(
+            (
+                strata["code"].to_numpy(),
+                -strata["Stratum Population"].to_numpy(),
+                strata["frame"].to_numpy(),
+            )
+        )
+    ].reset_index(drop=True)
+
+    allocation = frames.iloc[strata["frame"]].reset_index(drop=True)
+    population = allocation["Population"].to_numpy()
+    stratum_population = strata["Stratum Population"].to_numpy()
+    stratified = strata["code"].to_numpy() >= 0
+    allocation["New Sample Size"] = np.where(
+        stratified, new_sample_sizes(population), np.nan
+    )
+    allocation["StrataVal"] = [
+        str(code).zfill(len(registry.stratify_params(rule_id))) if code >= 0 else "NA"
+        for rule_id, code in zip(allocation["Rule ID"], strata["code"])
+    ]
+    allocation["Stratum Population"] = stratum_population
+    allocation["Stratum Sample Size"] = np.where(
+        stratified,
+        stratum_sample_sizes(
+            stratum_population, allocation["New Sample Size"].to_numpy(), population
+        ),
+        stratum_population,
+    ).astype(np.int64)
+
+    row_strata = np.full(len(row_frames), -1, dtype=np.int64)
+    if len(strata):
+        stratum_ids = pd.MultiIndex.from_arrays([strata["frame"], strata["code"]])
+        row_strata[valid] = stratum_ids.get_indexer(
+            pd.MultiIndex.from_arrays([row_frames[valid], codes[valid]])
+        )
+    return allocation, row_strata
+
+
+def draw_rule(row_strata, positions, sample_sizes, shuffled, seed_sequence):
+    # a random key per alert; the first sample_size alerts of every stratum by
+    # key are drawn. "NA" strata keep their alerts in file order
+    keys = np.random.default_rng(seed_sequence).random(len(row_strata))
+    keys = np.where(shuffled[row_strata], keys, 0.0)
+    order = np.lexsort((keys, row_strata))
+    row_strata = row_strata[order]
+
+    starts = np.flatnonzero(np.r_[True, row_strata[1:] != row_strata[:-1]])
+    run_lengths = np.diff(np.append(starts, len(row_strata)))
+    ranks = np.arange(len(row_strata)) - np.repeat(starts, run_lengths)
+    return positions[order][ranks < sample_sizes[row_strata]]
+
+
+def draw_sample(allocation, row_strata, seed=SAMPLE_SEED, workers=None):
+    # each rule draws from its own stream spawned off the seed, so the sample
+    # is the same however many workers draw it
+    rule_codes = pd.factorize(allocation["Rule ID"])[0]
+    sampled = np.flatnonzero(row_strata >= 0)
+    rows_rules = rule_codes[row_strata[sampled]]
+    order = np.argsort(rows_rules, kind="stable")
+    splits = np.flatnonzero(np.diff(rows_rules[order])) + 1
+    rule_positions = np.split(sampled[order], splits) if len(sampled) else []
+
+    seed_sequences = np.random.SeedSequence(seed).spawn(len(rule_positions))
+    sample_sizes = allocation["Stratum Sample Size"].to_numpy()
+    shuffled = (allocation["StrataVal"] != "NA").to_numpy()
+    arguments = (
+        [row_strata[positions] for positions in rule_positions],
+        rule_positions,
+        [sample_sizes] * len(rule_positions),
+        [shuffled] * len(rule_positions),
+        seed_sequences,
+    )
+
+    if not workers or workers <= 1:
+        drawn = list(map(draw_rule, *arguments))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            drawn = list(executor.map(draw_rule, *arguments))
+    return np.concatenate(drawn) if drawn else np.empty(0, dtype=np.int64)
+
+
+def sample_alerts(
+    data_to_sample, pop_groups_exist=True, seed=SAMPLE_SEED, workers=None, registry=None
+):
+    allocation, row_strata = allocation_table(
+        data_to_sample, pop_groups_exist, registry
+    )
+    positions = draw_sample(allocation, row_strata, seed, workers)
+
+    full_sample = data_to_sample.take(positions).assign(
+        StrataVal=allocation["StrataVal"].to_numpy()[row_strata[positions]]
+    )
+
+    stratified = allocation[allocation["StrataVal"] != "NA"]
+    if pop_groups_exist:
+        qc = stratified[["Rule ID", "Population Group", "New Sample Size"]].set_axis(
+            ["rule", "pop", "popsampsize"], axis=1
+        )
+    else:
+        qc = stratified[["Rule ID", "New Sample Size"]].set_axis(
+            ["rule", "sampsize"], axis=1
+        )
+    qc = qc.reset_index(drop=True)
+
+    keys = ["Rule ID", "Population Group"] if pop_groups_exist else ["Rule ID"]
+    frame_sizes = allocation.groupby(keys, sort=False, observed=True)[
+        "Stratum Sample Size"
+    ].sum()
+    for frame, sample_count in frame_sizes.items():
+        if pop_groups_exist:
+            print(f"RuleID Sampled:  {frame[0]}")
+            print(f"Pop Group Sampled: {frame[1]}")
+        else:
+            print(f"RuleID Sampled:  {frame}")
+        print(f"Sample Size:  {sample_count}")
+
+    print(
+        f'{len(full_sample["Rule ID"].unique())} rules have been sampled for a total of {len(full_sample)} alerts'
+    )
+    return full_sample, qc, allocation
+
+
+if __name__ == "__main__":
+    fp = "C:/Users/SprongJ/OneDrive - Crowe LLP/Documents/Non-Charge/Innovation Challenge/TM Tuning/Sampling/"
+
+    data_to_sample = pd.read_excel(
+        fp + "Python Data Deduped.xlsx",
+        sheet_name="Python Data Deduped",
+        na_values="",
+    )
+
+    full_sample, qc, allocation = sample_alerts(data_to_sample)
+
+    full_sample.to_csv(fp + "Python Sample.csv", index=False)
+    qc.to_csv(fp + "Python QC.csv", index=False)
+    allocation.to_csv(fp + "Python Allocation.csv", index=False)
@@ -0,0 +1,243 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from alert_store import AlertStore
+from ingest import iter_alert_chunks, pipeline_column, read_alerts
+from rule_registry import load_rule_registry
+from merged_tuning_tracker import (
+    COLUMNS_TO_ADD_ATL,
+    COLUMNS_TO_ADD_BTL,
+    GROUP_KEYS,
+    calculate_date_range,
+    calculate_final_fields_atl,
+    calculate_final_fields_btl,
+    calculate_net_effectiveness_atl,
+    calculate_net_effectiveness_btl,
+    count_delta_alerts,
+    create_empty_columns,
+    filter_tracker,
+    populate_current_result_info_atl,
+    populate_current_result_info_btl,
+    read_table,
+    type_alerts,
+    write_tracker,
+)
+
+COMPARISON_KEYS = ["Rule ID", "Population Group", "Parameter Type"]
+COMPARISON_METRICS = [
+    "Recommended Threshold",
+    "Effectiveness",
+    "Prop Effectiveness",
+    "Net Effectiveness",
+]
+
+# alerts loaded once per worker process by the pool initializer
+worker_alerts = {}
+
+
+def tracker_scenarios(file_paths=None, workbook=None):
+    # one scenario per tracker workbook, or one per sheet of a single workbook
+    if workbook is not None:
+        sheet_names = pd.ExcelFile(workbook).sheet_names
+        return [(sheet_name, workbook, sheet_name) for sheet_name in sheet_names]
+    return [
+        (os.path.splitext(os.path.basename(file_path))[0], file_path, 0)
+        for file_path in file_paths
+    ]
+
+
+def load_btl_alerts(
+    delta_file, sample_file, chunk_rows=None, typed=True, rule_config=None
+):
+    # the alerts are shared by every scenario's tracker, so they are projected
+    # but never filtered by rule
+    if chunk_rows:
+        delta_data = iter_alert_chunks(
+            delta_file, sheet_name=1, chunk_rows=chunk_rows, columns=GROUP_KEYS
+        )
+    else:
+        delta_data = read_table(delta_file, sheet_name=1, columns=GROUP_KEYS)
+    sample_data = read_table(sample_file, sheet_name=0, columns=pipeline_column)
+    if typed:
+        sample_data = type_alerts(sample_data, "Sample data")
+    sample_data["Alert Date"] = pd.to_datetime(sample_data["Alert Date"])
+
+    # the delta extract is only ever counted, so only its counts are kept
+    return {
+        "delta_counts": count_delta_alerts(delta_data),
+        "date_range": calculate_date_range(sample_data, "Alert Date"),
+        "sample_store": AlertStore(sample_data),
+        "registry": load_rule_registry(rule_config),
+    }
+
+
+def load_atl_alerts(dedupe_file, chunk_rows=None, typed=True, rule_config=None):
+    if chunk_rows:
+        dedupe_data = read_alerts(dedupe_file, sheet_name=0, chunk_rows=chunk_rows)
+    else:
+        dedupe_data = read_table(dedupe_file, sheet_name=0)
+    if typed:
+        dedupe_data = type_alerts(dedupe_data, "Dedupe data")
+    return {
+        "dedupe_store": AlertStore(dedupe_data, case_insensitive=True),
+        "registry": load_rule_registry(rule_config),
+    }
+
+
+def evaluate_btl_scenario(tracker, alerts, workers=None):
+    tracker = filter_tracker(tracker, "Yes")
+    tracker["Date Range"] = alerts["date_range"]
+    tracker = create_empty_columns(tracker, COLUMNS_TO_ADD_BTL)
+
+    tracker = populate_current_result_info_btl(
+        tracker, None, alerts["sample_store"], alerts["delta_counts"]
+    )
+    tracker = calculate_net_effectiveness_btl(
+        tracker, alerts["sample_store"], workers, alerts["registry"]
+    )
+    tracker = calculate_final_fields_btl(tracker)
+    tracker.fillna(0, inplace=True)
+    return tracker
+
+
+def evaluate_atl_scenario(tracker, alerts, workers=None):
+    tracker = filter_tracker(tracker, "Yes")
+    tracker = create_empty_columns(tracker, COLUMNS_TO_ADD_ATL)
+
+    tracker = populate_current_result_info_atl(
+        tracker, alerts["dedupe_store"], alerts["registry"]
+    )
+    tracker, _ = calculate_net_effectiveness_atl(
+        tracker, alerts["dedupe_store"], workers, alerts["registry"]
+    )
+    tracker = calculate_final_fields_atl(tracker)
+    tracker.fillna(0, inplace=True)
+    return tracker
+
+
+def set_worker_alerts(alerts):
+    worker_alerts.update(alerts)
+
+
+def evaluate_in_worker(evaluate, tracker):
+    return evaluate(tracker, worker_alerts)
+
+
+def evaluate_scenarios(evaluate, trackers, alerts, workers=None):
+    # scenarios run in parallel get the loaded alerts once per worker process
+    if not workers or workers <= 1:
+        return [evaluate(tracker, alerts) for tracker in trackers]
+
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=set_worker_alerts, initargs=(alerts,)
+    ) as executor:
+        return list(
+            executor.map(evaluate_in_worker, [evaluate] * len(trackers), trackers)
+        )
+
+
+def compare_scenarios(results):
+    comparison = None
+    for name, tracker in results.items():
+        scenario = tracker[COMPARISON_KEYS + COMPARISON_METRICS].copy()
+        # repeated parameters within a group are matched by position
+        scenario["Row"] = scenario.groupby(COMPARISON_KEYS, dropna=False).cumcount()
+        scenario = scenario.rename(
+            columns={metric: f"{metric} - {name}" for metric in COMPARISON_METRICS}
+        )
+        if comparison is None:
+            comparison = scenario
+        else:
+            comparison = comparison.merge(
+                scenario, on=COMPARISON_KEYS + ["Row"], how="outer"
+            )
+
+    comparison = comparison.sort_values(COMPARISON_KEYS + ["Row"]).drop(columns="Row")
+    ordered = [
+        f"{metric} - {name}" for metric in COMPARISON_METRICS for name in results
+    ]
+    return comparison[COMPARISON_KEYS + ordered].reset_index(drop=True)
+
+
+def write_scenarios(results, output_file_path, output_prefix):
+    for name, tracker in results.items():
+        write_tracker(tracker, f"{output_file_path}{output_prefix} - {name}.xlsx")
+
+    with pd.ExcelWriter(
+        f"{output_file_path}{output_prefix} - Scenario Comparison.xlsx"
+    ) as writer:
+        compare_scenarios(results).to_excel(
+            writer, sheet_name="Comparison", index=False
+        )
+
+
+def read_scenario_trackers(scenarios):
+    return [
+        read_table(file_path, sheet_name=sheet_name)
+        for _, file_path, sheet_name in scenarios
+    ]
+
+
+def run_btl_scenarios(
+    scenarios,
+    delta_file,
+    sample_file,
+    output_file_path,
+    output_prefix,
+    workers=None,
+    chunk_rows=None,
+    rule_config=None,
+):
+    alerts = load_btl_alerts(
+        delta_file, sample_file, chunk_rows, rule_config=rule_config
+    )
+    trackers = evaluate_scenarios(
+        evaluate_btl_scenario, read_scenario_trackers(scenarios), alerts, workers
+    )
+    results = dict(zip([name for name, _, _ in scenarios], trackers))
+    write_scenarios(results, output_file_path, output_prefix)
+    return results
+
+
+def run_atl_scenarios(
+    scenarios,
+    dedupe_file,
+    output_file_path,
+    output_prefix,
+    workers=None,
+    chunk_rows=None,
+    rule_config=None,
+):
+    alerts = load_atl_alerts(dedupe_file, chunk_rows, rule_config=rule_config)
+    trackers = evaluate_scenarios(
+        evaluate_atl_scenario, read_scenario_trackers(scenarios), alerts, workers
+    )
+    results = dict(zip([name for name, _, _ in scenarios], trackers))
+    write_scenarios(results, output_file_path, output_prefix)
+    return results
+
+
+if __name__ == "__main__":
+    btl_tracker_fp = "C:/Users/kadam/Documents/TM_Tuning_Codebase_Consolidation/Initial Data/Tuning Tracker - BTL/"
+    btl_tracker_ufp = (
+        "C:/Users/kadam/Documents/TM_Tuning_Codebase_Consolidation/New Data/"
+    )
+
+    # one workbook per threshold proposal
+    scenarios = tracker_scenarios(
+        [
+            btl_tracker_fp + "SAM Tuning - BTL Thresholds - Conservative.xlsx",
+            btl_tracker_fp + "SAM Tuning - BTL Thresholds - Moderate.xlsx",
+            btl_tracker_fp + "SAM Tuning - BTL Thresholds - Aggressive.xlsx",
+        ]
+    )
+
+    run_btl_scenarios(
+        scenarios,
+        btl_tracker_fp + "UAT Alerts - Parsed and Deduped.xlsx",
+        btl_tracker_fp + "UAT Alerts - Sampled and Decisioned.xlsx",
+        btl_tracker_ufp,
+        "Production BTL Tuning Tracker",
+    )
@@ -0,0 +1,203 @@
+from functools import partial
+
+import numpy as np
+import pandas as pd
+
+from alert_store import AlertStore
+from merged_tuning_tracker import (
+    COLUMNS_TO_ADD_ATL,
+    OPERATOR_UFUNCS,
+    calculate_final_fields_atl,
+    calculate_net_effectiveness,
+    calculate_net_effectiveness_atl,
+    create_empty_columns,
+    populate_current_result_info_atl,
+)
+from rule_registry import load_rule_registry
+from threshold_sweep import count_passing, cumulative_decision_counts, percentage
+
+DECISIONS = ["SAR Filed", "Interesting", "Not Interesting"]
+
+
+def feasible_thresholds(
+    passing, initial, min_sar_retention=100.0, min_net_effectiveness=None
+):
+    # passing holds the SAR / Interesting / Not Interesting counts left at
+    # each candidate; retention is against every SAR of the group
+    net_sar, net_interesting, net_notinteresting = passing
+    retention = (
+        percentage(net_sar, initial[0])
+        if initial[0] > 0
+        else np.full(len(net_sar), 100.0)
+    )
+    feasible = retention >= min_sar_retention
+    if min_net_effectiveness is not None:
+        feasible &= (
+            percentage(
+                net_sar + net_interesting,
+                net_sar + net_interesting + net_notinteresting,
+            )
+            >= min_net_effectiveness
+        )
+    return feasible
+
+
+def pass_all_threshold(sorted_values, operator):
+    # the threshold every remaining alert passes; a strict operator needs one
+    # beyond the values, taken as the next whole number out
+    if operator == ">":
+        return np.ceil(sorted_values[0]) - 1
+    if operator == "<":
+        return np.floor(sorted_values[-1]) + 1
+    return sorted_values[0] if operator == ">=" else sorted_values[-1]
+
+
+def optimize_group(tracker_rows, alerts, parameters, constraints):
+    # the group's rows are ANDed, so each row is solved in tracker order on
+    # the alerts the rows before it still pass; the last row's choice then
+    # meets the constraints for the group's net alerts. a row keeps the
+    # fewest Not Interesting alerts, then the most SARs, then the most
+    # Interesting alerts. a row whose Parameter Type is not the column its
+    # threshold is evaluated on keeps its threshold; those rows filter the
+    # alerts first, so the rows solved after them still see every filter
+    codes = pd.Categorical(alerts["Tuning Decision"], categories=DECISIONS).codes
+    codes = codes.astype(np.int64)
+    initial = np.bincount(codes[codes >= 0], minlength=len(DECISIONS))
+    passed = np.ones(len(alerts), dtype=bool)
+
+    fixed = tracker_rows["Parameter Type"].to_numpy() != np.asarray(parameters)
+    order = np.argsort(~fixed, kind="stable")
+    results = []
+    for label, operator, current, parameter_type, param in zip(
+        tracker_rows.index[order],
+        tracker_rows["Operator"].iloc[order],
+        tracker_rows["Recommended Threshold"].astype(float).iloc[order],
+        tracker_rows["Parameter Type"].iloc[order],
+        np.asarray(parameters)[order],
+    ):
+        if operator not in OPERATOR_UFUNCS:
+            raise ValueError(f"Unknown operator: {operator}")
+        values = pd.to_numeric(alerts[param], errors="coerce").to_numpy(dtype=float)
+        sorted_values, cumulative = cumulative_decision_counts(
+            values[passed], codes[passed], len(DECISIONS)
+        )
+        status = "No Alerts"
+        threshold = current
+        if parameter_type != param:
+            status = "Parameter Mismatch"
+        elif len(sorted_values):
+            # passing every alert keeps the earlier rows' choice feasible
+            candidates = np.union1d(
+                sorted_values, [pass_all_threshold(sorted_values, operator)]
+            )
+            if not np.isnan(current):
+                candidates = np.union1d(candidates, [current])
+            passing = count_passing(sorted_values, cumulative, candidates, operator)
+            feasible = np.flatnonzero(
+                feasible_thresholds(passing, initial, **constraints)
+            )
+            status = "Infeasible"
+            if len(feasible):
+                best = np.lexsort(
+                    (
+                        -passing[1, feasible],
+                        -passing[0, feasible],
+                        passing[2, feasible],
+                    )
+                )[0]
+                threshold = candidates[feasible[best]]
+                status = "Optimized"
+
+        passed &= OPERATOR_UFUNCS[operator](values, threshold)
+        results.append((label, threshold, status))
+    return results
+
+
+def optimize_rule(rule, tracker_rule, rule_alerts, rule_parameters, constraints):
+    updates = []
+    for group in tracker_rule["Population Group"].unique():
+        tracker_rule_group = tracker_rule[tracker_rule["Population Group"] == group]
+        for label, threshold, status in optimize_group(
+            tracker_rule_group,
+            rule_alerts[group],
+            rule_parameters[tracker_rule_group.index],
+            constraints,
+        ):
+            updates.append(
+                (
+                    [label],
+                    {"Recommended Threshold": threshold, "Optimizer Status": status},
+                )
+            )
+    return updates, []
+
+
+def optimize_thresholds_atl(
+    tracker,
+    dedupe_data,
+    min_sar_retention=100.0,
+    min_net_effectiveness=None,
+    workers=None,
+    registry=None,
+):
+    # a copy of the tracker with the threshold of every row that maximizes
+    # the group's Not Interesting Alert Reduction within the constraints, and
+    # the ATL metrics at those thresholds. thresholds are searched on the
+    # same alert columns the ATL tracker evaluates them on, so only rows whose
+    # Parameter Type is that column are searched; a row that is not, or that
+    # cannot meet the constraints, keeps its threshold
+    if registry is None:
+        registry = load_rule_registry()
+    if not isinstance(dedupe_data, AlertStore):
+        dedupe_data = AlertStore(dedupe_data, case_insensitive=True)
+
+    tracker = tracker.copy()
+    tracker["Previous Recommended Threshold"] = tracker["Recommended Threshold"]
+    tracker["Optimizer Status"] = None
+    tracker, _ = calculate_net_effectiveness(
+        tracker,
+        dedupe_data,
+        partial(
+            optimize_rule,
+            constraints={
+                "min_sar_retention": min_sar_retention,
+                "min_net_effectiveness": min_net_effectiveness,
+            },
+        ),
+        case_insensitive=True,
+        workers=workers,
+        registry=registry,
+    )
+
+    tracker = create_empty_columns(tracker, COLUMNS_TO_ADD_ATL)
+    tracker = populate_current_result_info_atl(tracker, dedupe_data, registry)
+    tracker, _ = calculate_net_effectiveness_atl(
+        tracker, dedupe_data, workers, registry
+    )
+    tracker = calculate_final_fields_atl(tracker)
+    tracker.fillna(0, inplace=True)
+    return tracker
+
+
+if __name__ == "__main__":
+    from merged_tuning_tracker import (
+        filter_tracker,
+        read_table,
+        type_alerts,
+        write_tracker,
+    )
+
+    fp = "C:/Users/kadam/Documents/TM_Tuning_Codebase_Consolidation/Initial Data/"
+    ufp = "C:/Users/kadam/Documents/TM_Tuning_Codebase_Consolidation/New Data/"
+
+    tracker = filter_tracker(
+        read_table(fp + "Proposed ATL High Priority Thresholds.xlsx"), "Yes"
+    )
+    dedupe_data = type_alerts(
+        read_table(fp + "Actimize Alert Output - Parsed and Deduped.xlsx"),
+        "Dedupe data",
+    )
+    write_tracker(
+        optimize_thresholds_atl(tracker, dedupe_data, min_sar_retention=100.0),
+        ufp + "Actimize Tuning Tracker - Optimized Thresholds.xlsx",
+    )
@@ -0,0 +1,344 @@
+import numpy as np
+import pandas as pd
+
+from rule_registry import load_rule_registry
+
+GROUP_KEYS = ["Rule ID", "Population Group"]
+SWEEP_KEYS = ["Rule ID", "Population Group", "Parameter Type", "Operator"]
+# the trackers' Prop columns count the alerts at or above each row's threshold
+PROP_OPERATOR = ">="
+
+# side passed to searchsorted, and whether the operator keeps values above it
+OPERATOR_SEARCH = {
+    ">=": ("left", True),
+    ">": ("right", True),
+    "<=": ("right", False),
+    "<": ("left", False),
+}
+
+
+def cumulative_decision_counts(values, decision_codes, n_decisions):
+    keep = ~np.isnan(values)
+    values = values[keep]
+    decision_codes = decision_codes[keep]
+
+    order = np.argsort(values, kind="stable")
+    sorted_values = values[order]
+    one_hot = decision_codes[order][None, :] == np.arange(n_decisions)[:, None]
+
+    cumulative = np.zeros((n_decisions, len(sorted_values) + 1), dtype=np.int64)
+    np.cumsum(one_hot, axis=1, out=cumulative[:, 1:])
+    return sorted_values, cumulative
+
+
+def count_passing(sorted_values, cumulative, thresholds, operator):
+    if operator not in OPERATOR_SEARCH:
+        raise ValueError(f"Unknown operator: {operator}")
+    side, keep_above = OPERATOR_SEARCH[operator]
+
+    positions = np.searchsorted(sorted_values, thresholds, side=side)
+    if keep_above:
+        return cumulative[:, -1:] - cumulative[:, positions]
+    return cumulative[:, positions]
+
+
+def percentage(numerator, denominator):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result = np.round(100 * numerator / denominator, 2)
+    return np.where(denominator > 0, result, 0)
+
+
+def sweep_groups(
+    tracker, alert_data, rule_ids, decisions, thresholds, parameter_type, operator
+):
+    # parameter_type and operator are a value for every row or one per row;
+    # None keeps the row's own column
+    tracker_rule_ids = tracker["Rule ID"].str.upper()
+    sweep_rows = tracker.assign(**{"Rule ID": tracker_rule_ids})
+    if parameter_type is not None:
+        sweep_rows["Parameter Type"] = parameter_type
+    if operator is not None:
+        sweep_rows["Operator"] = operator
+    sweep_rows = sweep_rows[SWEEP_KEYS].drop_duplicates()
+
+    alert_keys = pd.DataFrame(
+        {
+            "Rule ID": rule_ids.to_numpy(),
+            "Population Group": alert_data["Population Group"].to_numpy(),
+        }
+    )
+    group_positions = alert_keys.groupby(GROUP_KEYS).indices
+
+    decision_codes = pd.Categorical(
+        alert_data["Tuning Decision"], categories=decisions
+    ).codes.astype(np.int64)
+    numeric_columns = {}
+
+    for rule, group, param, operator in sweep_rows.itertuples(index=False):
+        positions = group_positions.get((rule, group), np.array([], dtype=np.int64))
+        if param not in numeric_columns:
+            numeric_columns[param] = pd.to_numeric(
+                alert_data[param], errors="coerce"
+            ).to_numpy(dtype=float)
+
+        codes = decision_codes[positions]
+        sorted_values, cumulative = cumulative_decision_counts(
+            numeric_columns[param][positions], codes, len(decisions)
+        )
+        candidates = (
+            np.unique(sorted_values)
+            if thresholds is None
+            else np.asarray(thresholds, dtype=float)
+        )
+        passing = count_passing(sorted_values, cumulative, candidates, operator)
+        initial = np.bincount(codes[codes >= 0], minlength=len(decisions))
+
+        yield (rule, group, param, operator), candidates, passing, initial
+
+
+def sweep_thresholds_atl(
+    tracker,
+    dedupe_data,
+    thresholds=None,
+    parameter_type=None,
+    operator=PROP_OPERATOR,
+    registry=None,
+):
+    # by default every row is swept the way the ATL tracker counts its Prop
+    # columns, on the registry's threshold parameter
+    decisions = ["SAR Filed", "Interesting", "Not Interesting"]
+    if parameter_type is None:
+        if registry is None:
+            registry = load_rule_registry()
+        parameter_type = registry.threshold_parameters(
+            tracker, tracker["Rule ID"].str.upper()
+        )
+    curves = []
+
+    for keys, candidates, passing, initial in sweep_groups(
+        tracker,
+        dedupe_data,
+        dedupe_data["Rule ID"].str.upper(),
+        decisions,
+        thresholds,
+        parameter_type,
+        operator,
+    ):
+        prop_sar, prop_interesting, prop_notinteresting = passing
+        prop_total = prop_sar + prop_interesting + prop_notinteresting
+        curves.append(
+            pd.DataFrame(
+                {
+                    **dict(zip(SWEEP_KEYS, keys)),
+                    "Threshold": candidates,
+                    "Prop SARs Filed": prop_sar,
+                    "Prop Interesting Alerts": prop_interesting,
+                    "Prop Not Interesting Alerts": prop_notinteresting,
+                    "Prop Effectiveness": percentage(
+                        prop_interesting + prop_sar, prop_total
+                    ),
+                    "Prop SAR Yield": percentage(prop_sar, prop_total),
+                    "Not Interesting Alert Reduction": percentage(
+                        initial[2] - prop_notinteresting, initial[2]
+                    ),
+                }
+            )
+        )
+
+    return concat_curves(curves)
+
+
+def sweep_thresholds_btl(
+    tracker, sample_data, thresholds=None, parameter_type=None, operator=PROP_OPERATOR
+):
+    # the BTL tracker counts its Prop columns on each row's own Parameter Type
+    decisions = ["Interesting", "Not Interesting"]
+    curves = []
+
+    for keys, candidates, passing, initial in sweep_groups(
+        tracker,
+        sample_data,
+        sample_data["Rule ID"].str.upper(),
+        decisions,
+        thresholds,
+        parameter_type,
+        operator,
+    ):
+        prop_interesting, prop_notinteresting = passing
+        curves.append(
+            pd.DataFrame(
+                {
+                    **dict(zip(SWEEP_KEYS, keys)),
+                    "Threshold": candidates,
+                    "Prop Interesting Alerts": prop_interesting,
+                    "Prop Not Interesting Alerts": prop_notinteresting,
+                    "Prop Effectiveness": percentage(
+                        prop_interesting, prop_interesting + prop_notinteresting
+                    ),
+                }
+            )
+        )
+
+    return concat_curves(curves)
+
+
+def concat_curves(curves):
+    if not curves:
+        return pd.DataFrame(columns=SWEEP_KEYS + ["Threshold"])
+    return pd.concat(curves, ignore_index=True)
+
+
+def pass_bins(values, candidates, operator):
+    # the candidate thresholds an alert passes are a prefix (>=, >) or a
+    # suffix (<=, <) of the sorted candidates; its bin is where that run ends
+    # or starts. missing values go to the bin that passes nothing
+    if operator not in OPERATOR_SEARCH:
+        raise ValueError(f"Unknown operator: {operator}")
+    side, keep_above = OPERATOR_SEARCH[operator]
+    # this searches values among thresholds, so it takes the other side
+    side = "right" if side == "left" else "left"
+    bins = np.searchsorted(candidates, values, side=side)
+    missing_bin = 0 if keep_above else len(candidates)
+    return np.where(np.isnan(values), missing_bin, bins), keep_above
+
+
+def passing_counts(histogram, axis, keep_above):
+    # counts of alerts passing each candidate along one axis of a histogram
+    # of pass bins, which is one longer than the candidates
+    if keep_above:
+        # passes candidate i when its bin is above i
+        flipped = np.flip(np.cumsum(np.flip(histogram, axis), axis=axis), axis)
+        return np.delete(flipped, 0, axis=axis)
+    return np.delete(np.cumsum(histogram, axis=axis), -1, axis=axis)
+
+
+def grid_candidates(values, proposed, grid_size):
+    # every distinct value, or grid_size quantiles of them, plus the proposed
+    # threshold so the grid holds the tracker's own point
+    values = values[~np.isnan(values)]
+    candidates = np.unique(values)
+    if len(candidates) > grid_size:
+        candidates = np.unique(np.quantile(values, np.linspace(0, 1, grid_size)))
+    if not np.isnan(proposed):
+        candidates = np.union1d(candidates, [proposed])
+    return candidates
+
+
+def joint_threshold_grid(
+    tracker,
+    dedupe_data,
+    rule_id,
+    population_group,
+    thresholds=None,
+    grid_size=200,
+    registry=None,
+):
+    # net counts of a group whose two tracker rows are ANDed, as ATL net
+    # effectiveness does, for every pair of candidate thresholds. each alert
+    # falls in one cell of a 2-D histogram of pass bins; cumulative sums over
+    # both axes then give every cell's counts without filtering per cell.
+    # each row is evaluated on the registry's threshold parameter with its own
+    # operator, as the tracker does; a row whose Parameter Type is not that
+    # column is flagged as a Parameter Mismatch
+    if registry is None:
+        registry = load_rule_registry()
+    decisions = ["SAR Filed", "Interesting", "Not Interesting"]
+    tracker_rows = tracker[
+        (tracker["Rule ID"].str.upper() == rule_id.upper())
+        & (tracker["Population Group"] == population_group)
+    ]
+    parameter_types = tracker_rows["Parameter Type"].tolist()
+    if len(tracker_rows) != 2 or parameter_types[0] == parameter_types[1]:
+        raise ValueError(
+            f"{rule_id} / {population_group} needs two tracker rows on different "
+            f"parameters, it has {parameter_types}"
+        )
+    evaluated = registry.threshold_parameters(
+        tracker_rows, tracker_rows["Rule ID"].str.upper()
+    ).tolist()
+
+    alerts = dedupe_data[
+        (dedupe_data["Rule ID"].astype(object).str.upper() == rule_id.upper())
+        & (dedupe_data["Population Group"] == population_group).to_numpy()
+    ]
+    decision_codes = pd.Categorical(
+        alerts["Tuning Decision"], categories=decisions
+    ).codes.astype(np.int64)
+    # alerts with any other decision are counted in the last slot
+    decision_codes[decision_codes < 0] = len(decisions)
+    n_slots = len(decisions) + 1
+
+    axes = []
+    for position, (param, operator, proposed) in enumerate(
+        zip(
+            evaluated,
+            tracker_rows["Operator"],
+            tracker_rows["Recommended Threshold"].astype(float),
+        )
+    ):
+        values = pd.to_numeric(alerts[param], errors="coerce").to_numpy(dtype=float)
+        candidates = (
+            grid_candidates(values, proposed, grid_size)
+            if thresholds is None
+            else np.unique(np.asarray(thresholds[position], dtype=float))
+        )
+        bins, keep_above = pass_bins(values, candidates, operator)
+        axes.append((param, operator, proposed, candidates, bins, keep_above))
+
+    x_param, x_operator, x_proposed, x_candidates, x_bins, x_above = axes[0]
+    y_param, y_operator, y_proposed, y_candidates, y_bins, y_above = axes[1]
+    shape = (n_slots, len(x_candidates) + 1, len(y_candidates) + 1)
+    cells = np.ravel_multi_index((decision_codes, x_bins, y_bins), shape)
+    histogram = np.bincount(cells, minlength=np.prod(shape)).reshape(shape)
+    counts = passing_counts(passing_counts(histogram, 1, x_above), 2, y_above)
+
+    initial = np.bincount(decision_codes, minlength=n_slots)
+    net_sar, net_interesting, net_notinteresting = (
+        counts[0].reshape(-1),
+        counts[1].reshape(-1),
+        counts[2].reshape(-1),
+    )
+    net_alerts = counts.sum(axis=0).reshape(-1)
+    x_grid, y_grid = np.meshgrid(x_candidates, y_candidates, indexing="ij")
+    return pd.DataFrame(
+        {
+            "Rule ID": rule_id,
+            "Population Group": population_group,
+            "Parameter Type X": parameter_types[0],
+            "Evaluated Parameter X": x_param,
+            "Parameter Mismatch X": parameter_types[0] != x_param,
+            "Operator X": x_operator,
+            "Threshold X": x_grid.reshape(-1),
+            "Parameter Type Y": parameter_types[1],
+            "Evaluated Parameter Y": y_param,
+            "Parameter Mismatch Y": parameter_types[1] != y_param,
+            "Operator Y": y_operator,
+            "Threshold Y": y_grid.reshape(-1),
+            "Proposed": (x_grid == x_proposed).reshape(-1)
+            & (y_grid == y_proposed).reshape(-1),
+            "Net SARs Filed": net_sar,
+            "Net Interesting Alerts": net_interesting,
+            "Net Not Interesting Alerts": net_notinteresting,
+            "Net Alerts": net_alerts,
+            "Net Effectiveness": percentage(
+                net_sar + net_interesting,
+                net_sar + net_interesting + net_notinteresting,
+            ),
+            "SAR Retention": np.where(
+                initial[0] > 0, percentage(net_sar, initial[0]), 100.0
+            ),
+            "Alert Reduction": percentage(initial.sum() - net_alerts, initial.sum()),
+            "Not Interesting Alert Reduction": percentage(
+                initial[2] - net_notinteresting, initial[2]
+            ),
+        }
+    )
+
+
+def pareto_frontier(grid, reduce="Alert Reduction", retain="SAR Retention"):
+    # the grid points no other point beats on both alert reduction and SAR
+    # retention, from the largest reduction down
+    order = np.lexsort((-grid[retain].to_numpy(), -grid[reduce].to_numpy()))
+    retained = grid[retain].to_numpy()[order]
+    best_before = np.maximum.accumulate(np.r_[-np.inf, retained[:-1]])
+    return grid.iloc[order[retained > best_before]].reset_index(drop=True)
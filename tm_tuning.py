@@ -0,0 +1,429 @@
+import argparse
+import json
+import os
+import sys
+
+import pandas as pd
+
+from backtest import monthly_aggregates_atl, monthly_aggregates_btl
+from dedupe import dedupe_alert_chunks
+from ingest import (
+    DEFAULT_CHUNK_ROWS,
+    apply_alert_schema,
+    iter_alert_chunks,
+    read_alerts,
+    write_frame,
+)
+from merged_tuning_tracker import (
+    filter_tracker,
+    process_atl_tuning_tracker,
+    process_btl_tuning_tracker,
+    read_table,
+    write_tracker,
+)
+from rule_registry import load_rule_registry
+from sampling import SAMPLE_SEED, sample_alerts
+from threshold_optimizer import optimize_thresholds_atl
+from threshold_sweep import (
+    joint_threshold_grid,
+    pareto_frontier,
+    sweep_thresholds_atl,
+    sweep_thresholds_btl,
+)
+
+# options each command cannot run without, whether given on the command line
+# or in the config file
+REQUIRED_OPTIONS = {
+    "dedupe": ["alerts", "output"],
+    "sample": ["alerts", "output"],
+    "atl": ["tracker", "alerts", "output"],
+    "btl": ["tracker", "delta", "sample", "output"],
+    "sweep": ["kind", "tracker", "alerts", "output"],
+    "backtest": ["kind", "tracker", "alerts", "output"],
+    "grid": ["tracker", "alerts", "rule", "group", "output"],
+    "optimize": ["tracker", "alerts", "output"],
+}
+
+
+def read_config(file_path):
+    # top-level keys apply to every command, a section named after a command
+    # only to that command; keys are the long option names with underscores
+    extension = os.path.splitext(file_path)[1].lower()
+    with open(file_path) as handle:
+        if extension in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError("Reading a YAML config requires PyYAML")
+            return yaml.safe_load(handle) or {}
+        elif extension == ".json":
+            return json.load(handle)
+    raise ValueError(f"Unknown config format: {extension}")
+
+
+def command_config(config, command):
+    values = {
+        key: value for key, value in config.items() if not isinstance(value, dict)
+    }
+    values.update(config.get(command, {}))
+    return {key.replace("-", "_"): value for key, value in values.items()}
+
+
+def sheet(value):
+    return int(value) if str(value).isdigit() else value
+
+
+def read_raw_alerts(file_path, args):
+    # raw extracts are read untyped and deduped chunk by chunk, as dedupe.py
+    return dedupe_alert_chunks(
+        iter_alert_chunks(
+            file_path,
+            sheet_name=args.sheet,
+            chunk_rows=args.chunk_rows or DEFAULT_CHUNK_ROWS,
+            columns=None,
+            dtype=None,
+        ),
+        load_rule_registry(args.rule_config),
+    )
+
+
+def read_deduped_alerts(args):
+    if args.dedupe:
+        return read_raw_alerts(args.alerts, args)
+    return pd.concat(
+        iter_alert_chunks(
+            args.alerts,
+            sheet_name=args.sheet,
+            chunk_rows=args.chunk_rows or DEFAULT_CHUNK_ROWS,
+            columns=None,
+            dtype=None,
+        )
+    )
+
+
+def run_dedupe(args):
+    write_frame(read_raw_alerts(args.alerts, args), args.output)
+
+
+def run_sample(args):
+    full_sample, qc, allocation = sample_alerts(
+        read_deduped_alerts(args),
+        not args.no_population_groups,
+        args.seed,
+        args.workers,
+        load_rule_registry(args.rule_config),
+    )
+    write_frame(full_sample, args.output)
+    if args.qc:
+        write_frame(qc, args.qc)
+    if args.allocation:
+        write_frame(allocation, args.allocation)
+
+
+def tracker_options(args):
+    return {
+        "threshold_sweep": args.threshold_sweep,
+        "sweep_thresholds": args.sweep_thresholds,
+        "confidence_intervals": args.confidence_intervals,
+        "workers": args.workers,
+        "constant_memory": args.constant_memory,
+        "chunk_rows": args.chunk_rows,
+        "typed": not args.untyped,
+        "run_report": args.run_report,
+        "profile_dir": args.profile_dir,
+        "incremental": args.incremental,
+        "rule_config": args.rule_config,
+        "cache_dir": args.cache_dir,
+    }
+
+
+def run_atl(args):
+    # with --dedupe the raw extract is deduped and handed over in memory
+    dedupe_data = read_raw_alerts(args.alerts, args) if args.dedupe else None
+    process_atl_tuning_tracker(
+        "",
+        args.tracker,
+        "",
+        args.alerts,
+        "",
+        args.output,
+        net_alerts_output=args.net_alerts,
+        dedupe_data=dedupe_data,
+        **tracker_options(args),
+    )
+
+
+def run_btl(args):
+    # with --dedupe the raw delta extract is deduped and handed over in memory
+    delta_data = read_raw_alerts(args.delta, args) if args.dedupe else None
+    process_btl_tuning_tracker(
+        "",
+        args.tracker,
+        "",
+        args.delta,
+        "",
+        args.sample,
+        "",
+        args.output,
+        delta_data=delta_data,
+        **tracker_options(args),
+    )
+
+
+def read_tunable_tracker(args):
+    return filter_tracker(
+        read_table(
+            args.tracker,
+            cache_dir=args.cache_dir,
+            filters={"Is Tunable": ["Yes"]},
+        ),
+        "Yes",
+    )
+
+
+def read_typed_alerts(args, typed=True):
+    alerts = read_alerts(
+        args.alerts,
+        sheet_name=args.sheet,
+        chunk_rows=args.chunk_rows or DEFAULT_CHUNK_ROWS,
+    )
+    if typed:
+        alerts = apply_alert_schema(alerts)
+    return alerts
+
+
+def run_sweep(args):
+    tracker = read_tunable_tracker(args)
+    alerts = read_typed_alerts(args, not args.untyped)
+    if args.kind == "atl":
+        sweep = sweep_thresholds_atl(
+            tracker,
+            alerts,
+            args.sweep_thresholds,
+            registry=load_rule_registry(args.rule_config),
+        )
+    else:
+        sweep = sweep_thresholds_btl(tracker, alerts, args.sweep_thresholds)
+    write_frame(sweep, args.output)
+
+
+def run_grid(args):
+    grid = joint_threshold_grid(
+        read_tunable_tracker(args),
+        read_typed_alerts(args),
+        args.rule,
+        args.group,
+        grid_size=args.grid_size,
+        registry=load_rule_registry(args.rule_config),
+    )
+    write_frame(grid, args.output)
+    if args.frontier:
+        write_frame(pareto_frontier(grid), args.frontier)
+
+
+def run_optimize(args):
+    tracker = optimize_thresholds_atl(
+        read_tunable_tracker(args),
+        read_typed_alerts(args),
+        args.min_sar_retention,
+        args.min_net_effectiveness,
+        args.workers,
+        load_rule_registry(args.rule_config),
+    )
+    write_tracker(tracker, args.output)
+
+
+def run_backtest(args):
+    # with a first or last month one window is written, otherwise every
+    # rolling window of --window-months
+    aggregate = monthly_aggregates_atl if args.kind == "atl" else monthly_aggregates_btl
+    aggregates = aggregate(
+        read_tunable_tracker(args),
+        read_typed_alerts(args),
+        load_rule_registry(args.rule_config),
+    )
+    if args.first_month or args.last_month:
+        windows = aggregates.window(args.first_month, args.last_month)
+    else:
+        windows = aggregates.rolling(args.window_months, args.step)
+    write_frame(windows, args.output)
+    if args.monthly_counts:
+        write_frame(aggregates.monthly_counts(), args.monthly_counts)
+
+
+def add_common_options(parser):
+    parser.add_argument("--config", help="JSON or YAML file of option values")
+    parser.add_argument("--workers", type=int, help="processes to spread rules over")
+    parser.add_argument("--cache-dir", help="where parsed workbooks are cached")
+    parser.add_argument("--chunk-rows", type=int, help="stream alerts in chunks")
+    parser.add_argument("--rule-config", help="rule registry config file")
+
+
+def add_tracker_options(parser):
+    parser.add_argument(
+        "--tracker", help="tuning tracker (.xlsx, .csv, .parquet, .arrow)"
+    )
+    parser.add_argument(
+        "--output", help="tracker output (.xlsx, .csv, .parquet, .arrow)"
+    )
+    parser.add_argument("--threshold-sweep", action="store_true")
+    parser.add_argument("--sweep-thresholds", type=float, nargs="+")
+    parser.add_argument(
+        "--confidence-intervals",
+        action="store_true",
+        help="add bootstrap and Wilson intervals of the metrics as a sheet",
+    )
+    parser.add_argument("--constant-memory", action="store_true")
+    parser.add_argument("--untyped", action="store_true", help="keep alerts as text")
+    parser.add_argument("--incremental", action="store_true")
+    parser.add_argument("--run-report", help="write stage timings to this file")
+    parser.add_argument("--profile-dir", help="write a cProfile dump per stage")
+    parser.add_argument(
+        "--dedupe", action="store_true", help="dedupe a raw extract in memory first"
+    )
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="tm-tuning", description="Transaction monitoring tuning pipeline."
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    dedupe = commands.add_parser("dedupe", help="dedupe a raw alert extract")
+    dedupe.add_argument("--alerts", help="raw alert extract")
+    dedupe.add_argument("--sheet", type=sheet, default=0)
+    dedupe.add_argument(
+        "--output", help="deduped alerts (.xlsx, .csv, .parquet, .arrow)"
+    )
+    dedupe.set_defaults(function=run_dedupe)
+
+    sample = commands.add_parser("sample", help="draw the stratified sample")
+    sample.add_argument("--alerts", help="deduped alert extract")
+    sample.add_argument("--sheet", type=sheet, default=0)
+    sample.add_argument(
+        "--output", help="sampled alerts (.xlsx, .csv, .parquet, .arrow)"
+    )
+    sample.add_argument("--qc", help="QC table output")
+    sample.add_argument("--allocation", help="allocation table output")
+    sample.add_argument("--seed", type=int, default=SAMPLE_SEED)
+    sample.add_argument("--no-population-groups", action="store_true")
+    sample.add_argument(
+        "--dedupe", action="store_true", help="dedupe a raw extract in memory first"
+    )
+    sample.set_defaults(function=run_sample)
+
+    atl = commands.add_parser("atl", help="run the ATL tuning tracker")
+    add_tracker_options(atl)
+    atl.add_argument("--alerts", help="deduped (or, with --dedupe, raw) alerts")
+    atl.add_argument("--sheet", type=sheet, default=0, help="sheet of a raw extract")
+    atl.add_argument("--net-alerts", choices=["csv", "parquet", "feather", "xlsx"])
+    atl.set_defaults(function=run_atl)
+
+    btl = commands.add_parser("btl", help="run the BTL tuning tracker")
+    add_tracker_options(btl)
+    btl.add_argument("--delta", help="delta alerts (or, with --dedupe, raw alerts)")
+    btl.add_argument("--sample", help="sampled and decisioned alerts")
+    btl.add_argument("--sheet", type=sheet, default=0, help="sheet of a raw extract")
+    btl.set_defaults(function=run_btl)
+
+    sweep = commands.add_parser("sweep", help="write a threshold sweep table")
+    sweep.add_argument("--kind", choices=["atl", "btl"])
+    sweep.add_argument(
+        "--tracker", help="tuning tracker (.xlsx, .csv, .parquet, .arrow)"
+    )
+    sweep.add_argument("--alerts", help="deduped (ATL) or sampled (BTL) alerts")
+    sweep.add_argument("--sheet", type=sheet, default=0)
+    sweep.add_argument("--output", help="sweep table (.xlsx, .csv, .parquet, .arrow)")
+    sweep.add_argument("--sweep-thresholds", type=float, nargs="+")
+    sweep.add_argument("--untyped", action="store_true", help="keep alerts as text")
+    sweep.set_defaults(function=run_sweep)
+
+    grid = commands.add_parser(
+        "grid", help="write an ATL group's net counts over two thresholds"
+    )
+    grid.add_argument(
+        "--tracker", help="tuning tracker (.xlsx, .csv, .parquet, .arrow)"
+    )
+    grid.add_argument("--alerts", help="deduped alerts")
+    grid.add_argument("--sheet", type=sheet, default=0)
+    grid.add_argument("--rule", help="Rule ID with two tracker rows in the group")
+    grid.add_argument("--group", help="Population Group")
+    grid.add_argument("--output", help="grid table (.xlsx, .csv, .parquet, .arrow)")
+    grid.add_argument("--frontier", help="Pareto frontier of the grid output")
+    grid.add_argument(
+        "--grid-size", type=int, default=200, help="most candidates per threshold"
+    )
+    grid.set_defaults(function=run_grid)
+
+    optimize = commands.add_parser(
+        "optimize", help="search the ATL thresholds that meet SAR constraints"
+    )
+    optimize.add_argument(
+        "--tracker", help="tuning tracker (.xlsx, .csv, .parquet, .arrow)"
+    )
+    optimize.add_argument("--alerts", help="deduped alerts")
+    optimize.add_argument("--sheet", type=sheet, default=0)
+    optimize.add_argument(
+        "--output", help="optimized tracker (.xlsx, .csv, .parquet, .arrow)"
+    )
+    optimize.add_argument(
+        "--min-sar-retention",
+        type=float,
+        default=100.0,
+        help="percent of each group's SARs its net alerts must keep",
+    )
+    optimize.add_argument(
+        "--min-net-effectiveness",
+        type=float,
+        help="lowest Net Effectiveness a group may end on",
+    )
+    optimize.set_defaults(function=run_optimize)
+
+    backtest = commands.add_parser(
+        "backtest", help="write tracker metrics over windows of months"
+    )
+    backtest.add_argument("--kind", choices=["atl", "btl"])
+    backtest.add_argument(
+        "--tracker", help="tuning tracker (.xlsx, .csv, .parquet, .arrow)"
+    )
+    backtest.add_argument("--alerts", help="deduped (ATL) or sampled (BTL) alerts")
+    backtest.add_argument("--sheet", type=sheet, default=0)
+    backtest.add_argument(
+        "--output", help="window metrics (.xlsx, .csv, .parquet, .arrow)"
+    )
+    backtest.add_argument("--window-months", type=int, default=12)
+    backtest.add_argument("--step", type=int, default=1, help="months between windows")
+    backtest.add_argument("--first-month", help="first month of one window (YYYY-MM)")
+    backtest.add_argument("--last-month", help="last month of one window (YYYY-MM)")
+    backtest.add_argument("--monthly-counts", help="per group and month counts output")
+    backtest.set_defaults(function=run_backtest)
+
+    for command in commands.choices.values():
+        add_common_options(command)
+    return parser, commands.choices
+
+
+def main(argv=None):
+    parser, commands = build_parser()
+    args = parser.parse_args(argv)
+
+    # config values become defaults, so the command line still overrides them
+    if args.config:
+        config = command_config(read_config(args.config), args.command)
+        commands[args.command].set_defaults(**config)
+        args = parser.parse_args(argv)
+
+    missing = [
+        "--" + option.replace("_", "-")
+        for option in REQUIRED_OPTIONS[args.command]
+        if getattr(args, option, None) is None
+    ]
+    if missing:
+        commands[args.command].error(f"missing {', '.join(missing)}")
+
+    args.function(args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,208 @@
+import argparse
+import sys
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_KEYS = ["Rule ID", "Population Group", "Parameter Type"]
+DEFAULT_ATOL = 1e-6
+DEFAULT_RTOL = 1e-9
+DEFAULT_ROWS = 20
+
+
+def read_output(file_path, sheet_name=0):
+    output = pd.read_excel(file_path, sheet_name=sheet_name)
+    # older trackers were written with stray spaces in headers ("Date Range ")
+    output.columns = [str(column).strip() for column in output.columns]
+    return output
+
+
+def align_outputs(expected, actual, keys):
+    # repeated keys (several rows of one parameter) are matched in file order
+    expected = expected.assign(
+        _occurrence=expected.groupby(keys, dropna=False).cumcount()
+    )
+    actual = actual.assign(_occurrence=actual.groupby(keys, dropna=False).cumcount())
+    return expected.merge(
+        actual,
+        on=keys + ["_occurrence"],
+        how="outer",
+        suffixes=(" (expected)", " (actual)"),
+        indicator=True,
+    )
+
+
+def as_numeric(values):
+    numeric = pd.to_numeric(values, errors="coerce")
+    if numeric.notna().sum() == values.notna().sum():
+        return numeric.to_numpy(dtype=float)
+    return None
+
+
+def column_mismatches(expected, actual, atol, rtol):
+    # returns the mismatch mask, the absolute differences (numeric only) and
+    # the comparison type
+    expected_numbers = as_numeric(expected)
+    actual_numbers = as_numeric(actual)
+    if expected_numbers is not None and actual_numbers is not None:
+        close = np.isclose(
+            expected_numbers, actual_numbers, rtol=rtol, atol=atol, equal_nan=True
+        )
+        with np.errstate(invalid="ignore"):
+            differences = np.abs(expected_numbers - actual_numbers)
+        return ~close, differences, "numeric"
+
+    expected_missing = expected.isna().to_numpy()
+    actual_missing = actual.isna().to_numpy()
+    equal = expected.astype(str).to_numpy() == actual.astype(str).to_numpy()
+    equal = (expected_missing & actual_missing) | (
+        ~expected_missing & ~actual_missing & equal
+    )
+    return ~equal, None, "text"
+
+
+def validate_outputs(
+    expected,
+    actual,
+    keys=DEFAULT_KEYS,
+    atol=DEFAULT_ATOL,
+    rtol=DEFAULT_RTOL,
+    rows=DEFAULT_ROWS,
+):
+    aligned = align_outputs(expected, actual, keys)
+    matched = aligned[aligned["_merge"] == "both"]
+
+    columns = [
+        column
+        for column in expected.columns
+        if column in actual.columns and column not in keys
+    ]
+    summary = []
+    differences = []
+    for column in columns:
+        mismatched, abs_differences, kind = column_mismatches(
+            matched[f"{column} (expected)"],
+            matched[f"{column} (actual)"],
+            atol,
+            rtol,
+        )
+        # a value missing on one side has no difference to report
+        finite_differences = (
+            abs_differences[mismatched & ~np.isnan(abs_differences)]
+            if abs_differences is not None
+            else []
+        )
+        summary.append(
+            {
+                "Column": column,
+                "Type": kind,
+                "Compared": len(matched),
+                "Mismatches": int(mismatched.sum()),
+                "Max Abs Diff": (
+                    finite_differences.max() if len(finite_differences) else np.nan
+                ),
+            }
+        )
+        if mismatched.any():
+            rows_differing = matched.loc[
+                mismatched, keys + [f"{column} (expected)", f"{column} (actual)"]
+            ]
+            differences.append(
+                rows_differing.rename(
+                    columns={
+                        f"{column} (expected)": "Expected",
+                        f"{column} (actual)": "Actual",
+                    }
+                ).assign(Column=column)
+            )
+
+    differences = (
+        pd.concat(differences)
+        .sort_index(kind="stable")
+        .head(rows)
+        .reset_index(drop=True)
+        if differences
+        else pd.DataFrame(columns=keys + ["Expected", "Actual", "Column"])
+    )
+    return {
+        "summary": pd.DataFrame(summary),
+        "differences": differences[keys + ["Column", "Expected", "Actual"]],
+        "missing_rows": aligned.loc[aligned["_merge"] != "both", keys + ["_merge"]]
+        .replace(
+            {"_merge": {"left_only": "expected only", "right_only": "actual only"}}
+        )
+        .rename(columns={"_merge": "Found In"})
+        .reset_index(drop=True),
+        "expected_only_columns": [
+            column for column in expected.columns if column not in actual.columns
+        ],
+        "actual_only_columns": [
+            column for column in actual.columns if column not in expected.columns
+        ],
+    }
+
+
+def passed(result):
+    return (
+        result["summary"]["Mismatches"].sum() == 0 if len(result["summary"]) else True
+    ) and result["missing_rows"].empty
+
+
+def print_result(result):
+    summary = result["summary"]
+    print(summary.to_string(index=False))
+    if result["expected_only_columns"]:
+        print(f"Columns only in expected: {result['expected_only_columns']}")
+    if result["actual_only_columns"]:
+        print(f"Columns only in actual: {result['actual_only_columns']}")
+    if not result["missing_rows"].empty:
+        print(f"{len(result['missing_rows'])} rows are not in both outputs:")
+        print(result["missing_rows"].to_string(index=False))
+    if not result["differences"].empty:
+        print(f"First {len(result['differences'])} differences:")
+        print(result["differences"].to_string(index=False))
+    print("Outputs match" if passed(result) else "Outputs differ")
+
+
+def write_result(result, file_path):
+    with pd.ExcelWriter(file_path) as writer:
+        result["summary"].to_excel(writer, sheet_name="Summary", index=False)
+        result["differences"].to_excel(writer, sheet_name="Differences", index=False)
+        result["missing_rows"].to_excel(writer, sheet_name="Missing Rows", index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare a tuning tracker output against the expected output."
+    )
+    parser.add_argument("expected", help="expected output workbook")
+    parser.add_argument("actual", help="new output workbook")
+    parser.add_argument("--sheet", default=0, help="sheet to compare in both files")
+    parser.add_argument(
+        "--keys", nargs="+", default=DEFAULT_KEYS, help="columns rows are aligned on"
+    )
+    parser.add_argument("--atol", type=float, default=DEFAULT_ATOL)
+    parser.add_argument("--rtol", type=float, default=DEFAULT_RTOL)
+    parser.add_argument(
+        "--rows", type=int, default=DEFAULT_ROWS, help="differing rows to show"
+    )
+    parser.add_argument("--report", help="write the comparison to this workbook")
+    args = parser.parse_args(argv)
+
+    sheet_name = int(args.sheet) if str(args.sheet).isdigit() else args.sheet
+    result = validate_outputs(
+        read_output(args.expected, sheet_name),
+        read_output(args.actual, sheet_name),
+        args.keys,
+        args.atol,
+        args.rtol,
+        args.rows,
+    )
+    print_result(result)
+    if args.report:
+        write_result(result, args.report)
+    return 0 if passed(result) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())